@@ -0,0 +1,252 @@
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# |z| deviations from a series' own baseline, in the degrading direction.
+DEVIATION_THRESHOLDS = {"critical": 4.0, "major": 2.5}
+
+
+def anomaly_scores(z: np.ndarray, scale: float = 3.0) -> np.ndarray:
+    """Map z-scores onto (-1, 0]; lower is more anomalous, like the forecast CSV."""
+    magnitude = np.abs(np.nan_to_num(z))
+    return 0.0 - magnitude / (magnitude + scale)
+
+
+def deviation_severity(z: np.ndarray, reverse_logic: bool) -> np.ndarray:
+    """Severity from deviation against the series' baseline.
+
+    Only degradations count: with ``reverse_logic`` (lower is worse) that is
+    a drop below the baseline, otherwise a rise above it. NaN is "minor".
+    """
+    worse = -np.asarray(z, dtype=np.float64) if reverse_logic else np.asarray(z, dtype=np.float64)
+    return np.select(
+        [worse >= DEVIATION_THRESHOLDS["critical"], worse >= DEVIATION_THRESHOLDS["major"]],
+        ["critical", "major"],
+        default="minor",
+    ).astype(object)
+
+
+class _KPIState:
+    """EWMA state for every site of one KPI, indexed by site code."""
+
+    __slots__ = ("mean", "var", "count", "z", "last_seen", "last_value")
+
+    def __init__(self, size: int = 0):
+        self.mean = np.zeros(size)
+        self.var = np.zeros(size)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.z = np.zeros(size)
+        self.last_seen = np.full(size, np.datetime64("NaT"), dtype="datetime64[s]")
+        self.last_value = np.full(size, np.nan)
+
+    def grow(self, size: int) -> None:
+        if size <= len(self.mean):
+            return
+        size = max(size, 2 * len(self.mean))
+        pad = size - len(self.mean)
+        self.mean = np.concatenate([self.mean, np.zeros(pad)])
+        self.var = np.concatenate([self.var, np.zeros(pad)])
+        self.count = np.concatenate([self.count, np.zeros(pad, dtype=np.int64)])
+        self.z = np.concatenate([self.z, np.zeros(pad)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(pad, np.datetime64("NaT"), dtype="datetime64[s]")])
+        self.last_value = np.concatenate([self.last_value, np.full(pad, np.nan)])
+
+
+class AnomalyScorer:
+    """Online per-(KPI, eNodeB) baselines with O(1) state per series.
+
+    Each series keeps an exponentially weighted mean and variance in flat
+    NumPy arrays. An ingest tick updates every touched series at once, and
+    each sample is scored against the baseline *before* it is folded in.
+    Scores keep the forecast file's shape: ``anomaly_score`` in (-1, 0],
+    lower is more anomalous. Series with fewer than ``warmup`` samples
+    score 0.
+    """
+
+    def __init__(self, alpha: float = 0.1, warmup: int = 5, scale: float = 3.0):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.scale = scale
+        self._states: Dict[str, _KPIState] = {}
+        # pd.Index of site ids by code; created on first update so importing
+        # this module does not load pandas.
+        self._sites: Optional["pd.Index"] = None
+        self._lock = threading.Lock()
+        self._pending = None
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        self.catch_up()
+        return int(sum(np.count_nonzero(state.count) for state in self._states.values()))
+
+    def reset(self) -> None:
+        self._pending = None
+        with self._lock:
+            self._states = {}
+            self._sites = None
+
+    def rebuild(self, store, defer: bool = False) -> None:
+        """Replay a KPIStore's history so baselines survive a reload.
+
+        With ``defer`` the replay waits for the first read or update, so
+        startup does not pay for it. The store's series are replaced on
+        every append, so the deferred replay still sees this exact history.
+        """
+        self._pending = (store.series, store.site_ids)
+        if not defer:
+            self.catch_up()
+
+    def catch_up(self) -> None:
+        """Run a deferred ``rebuild`` now, if one is pending or in progress."""
+        if self._pending is None and not self._rebuilding:
+            return
+        with self._rebuild_lock:
+            if self._pending is None:
+                return
+            # Set before _pending clears, so other threads wait on the lock
+            # instead of reading a half-built index.
+            self._rebuilding = True
+            pending, self._pending = self._pending, None
+            try:
+                self._replay(pending)
+            finally:
+                self._rebuilding = False
+
+    def _replay(self, pending) -> None:
+        series_by_key, site_ids = pending
+        self.reset()
+        for (kpi, _), series in series_by_key.items():
+            self._update(kpi, site_ids[series.sites], series.dates, series.values)
+
+    def update_frame(self, df: "pd.DataFrame") -> None:
+        """Fold in ingested samples (kpi, site_id, date, value)."""
+        df = df[df["site_id"] != ""].sort_values("date", kind="stable")
+        for kpi, idx in df.groupby("kpi", sort=False).indices.items():
+            self.update(kpi, df["site_id"].to_numpy()[idx], df["date"].to_numpy()[idx], df["value"].to_numpy()[idx])
+
+    def update(self, kpi: str, sites: Sequence, dates: np.ndarray, values: np.ndarray) -> None:
+        """Fold time-ordered samples of one KPI into the baselines."""
+        self.catch_up()
+        self._update(kpi, sites, dates, values)
+
+    def _update(self, kpi: str, sites: Sequence, dates: np.ndarray, values: np.ndarray) -> None:
+        if not len(values):
+            return
+        with self._lock:
+            codes = self._encode(sites)
+            state = self._states.setdefault(kpi, _KPIState())
+            state.grow(len(self._sites))
+            values = np.asarray(values, dtype=np.float64)
+            dates = np.asarray(dates, dtype="datetime64[s]")
+
+            if np.bincount(codes).max() == 1:
+                self._step(state, codes, dates, values)
+                return
+            # A site may appear several times in one tick; apply its samples
+            # in order, one vectorized round per occurrence.
+            order = np.argsort(codes, kind="stable")
+            sorted_codes = codes[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+            rank = np.empty(len(codes), dtype=np.int64)
+            rank[order] = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+            by_rank = np.argsort(rank, kind="stable")
+            bounds = np.searchsorted(rank[by_rank], np.arange(int(rank.max()) + 2))
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                sel = by_rank[lo:hi]
+                self._step(state, codes[sel], dates[sel], values[sel])
+
+    def _step(self, state: _KPIState, codes: np.ndarray, dates: np.ndarray, values: np.ndarray) -> None:
+        mean, var, count = state.mean[codes], state.var[codes], state.count[codes]
+        diff = values - mean
+        std = np.sqrt(var)
+        warm = (count >= self.warmup) & (std > 0)
+        state.z[codes] = np.where(warm, diff / np.where(std > 0, std, 1.0), 0.0)
+
+        first = count == 0
+        increment = self.alpha * diff
+        state.mean[codes] = np.where(first, values, mean + increment)
+        state.var[codes] = np.where(first, 0.0, (1 - self.alpha) * (var + diff * increment))
+        state.count[codes] = count + 1
+        state.last_seen[codes] = dates
+        state.last_value[codes] = values
+
+    def _encode(self, sites: Sequence) -> np.ndarray:
+        import pandas as pd
+
+        sites = pd.Index(np.asarray(sites).astype(str), dtype=object)
+        if self._sites is None:
+            self._sites = pd.Index([], dtype=object)
+        codes = self._sites.get_indexer(sites)
+        if (codes < 0).any():
+            self._sites = self._sites.append(sites[codes < 0].unique())
+            codes = self._sites.get_indexer(sites)
+        return codes.astype(np.int64)
+
+    def _code(self, site: Any) -> Optional[int]:
+        if self._sites is None:
+            return None
+        try:
+            return int(self._sites.get_loc(str(site)))
+        except KeyError:
+            return None
+
+    def zscores(self, kpis: Sequence[str], sites: Sequence[Any]) -> np.ndarray:
+        """Latest z-score per (kpi, site) pair; NaN where there is no baseline."""
+        self.catch_up()
+        out = np.full(len(sites), np.nan)
+        for i, (kpi, site) in enumerate(zip(kpis, sites)):
+            state, code = self._states.get(kpi), self._code(site)
+            if state is not None and code is not None and code < len(state.count) and state.count[code]:
+                out[i] = state.z[code]
+        return out
+
+    def scores_for_site(self, site: Any) -> List[Dict[str, Any]]:
+        """Latest anomaly score of every KPI tracked for one eNodeB."""
+        self.catch_up()
+        code = self._code(site)
+        if code is None:
+            return []
+        return [
+            self._point(kpi, state, code)
+            for kpi, state in self._states.items()
+            if code < len(state.count) and state.count[code]
+        ]
+
+    def most_anomalous(self, n: int, kpi: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The ``n`` lowest current scores, optionally for a single KPI."""
+        self.catch_up()
+        candidates: List[Tuple[float, str, int]] = []
+        for name, state in self._states.items():
+            if kpi is not None and name != kpi:
+                continue
+            live = np.flatnonzero(state.count)
+            if not len(live):
+                continue
+            magnitude = np.abs(state.z[live])
+            if len(live) > n:
+                live = live[np.argpartition(-magnitude, n - 1)[:n]]
+            candidates.extend((-abs(float(state.z[code])), name, int(code)) for code in live)
+        candidates.sort()
+        return [self._point(name, self._states[name], code) for _, name, code in candidates[:n]]
+
+    def _point(self, kpi: str, state: _KPIState, code: int) -> Dict[str, Any]:
+        z = float(state.z[code])
+        return {
+            "_DAY": str(state.last_seen[code]).replace("T", " "),
+            "ENODEB": self._sites[code],
+            "kpi": kpi,
+            "anomaly_score": round(float(anomaly_scores(np.array([z]), self.scale)[0]), 6),
+            "zscore": round(z, 3),
+            "value": float(state.last_value[code]),
+            "baseline": round(float(state.mean[code]), 4),
+            "samples": int(state.count[code]),
+        }
+
+
+anomaly_scorer = AnomalyScorer()
@@ -1,21 +1,187 @@
+import json
+import os
+from pathlib import Path
+
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
-from intent_parser import extract_intent
-from kpi_engine import get_kpi_data
-from rca_engine import perform_rca_analysis, get_rca_summary
+from anomaly import anomaly_scorer
+from correlation import get_correlation
+from forecast_store import FORECAST_CSV, forecast_store
+from hierarchy import network_hierarchy
+from ingest import ingest_samples
+from intent_parser import extract_intent, register_vocabulary
+from encoding import Series, series_response
+from kpi_engine import get_kpi_result, kpi_store, result_cache
+from metrics import init_app as init_metrics, registry, stage
+from offenders import offender_index
+from rca_engine import (
+    analysis_etag, perform_rca_analysis, perform_batch_rca_analysis, perform_cached_rca_analysis,
+    perform_site_rca_analysis, get_rca_summary, severity_index
+)
+from spatial import parse_bbox, site_grid
+from streaming import broker
 
 app = Flask(__name__)
-CORS(app)
+# The UI runs on another origin; it reads ETag to revalidate next-best-action.
+CORS(app, expose_headers=['ETag'])
+init_metrics(app)
+
+# Ingested samples and SSE subscribers live in this process's memory, so
+# ingest and streaming are only correct with a single, never-recycled
+# process. The dev server is one; wsgi.py turns this off unless Gunicorn is
+# started with REALTIME_INGEST=1, which gunicorn.conf.py pins to one worker.
+app.config.setdefault('REALTIME_INGEST', True)
+
+SITES_JSON = Path(__file__).resolve().parent.parent / 'src' / 'data' / 'sites.json'
+ENB_DETAILS_JSON = SITES_JSON.with_name('enb_details.json')
+
+
+def _load_sites():
+    if not SITES_JSON.exists():
+        return []
+    with open(SITES_JSON) as f:
+        return json.load(f)
+
+
+def _load_enb_details():
+    if not ENB_DETAILS_JSON.exists():
+        return {}
+    with open(ENB_DETAILS_JSON) as f:
+        return json.load(f)
+
+
+def _register_data_vocabulary():
+    """Teach the intent parser every KPI, market and site present in the data
+
+    Only sites with KPI samples are registered: a site named in a prompt
+    narrows the chart to that site's rollup.
+    """
+    register_vocabulary(
+        kpis={kpi for kpi, _ in kpi_store.series} | {site['kpi'] for site in sites},
+        markets={geo for _, geo in kpi_store.series} | {site['state'] for site in sites},
+        sites=kpi_store.site_ids
+    )
+
+
+def _index_offenders():
+    """Rank every site by its latest value, including the map's sites"""
+    offender_index.rebuild(
+        kpi_store,
+        [(site['kpi'], site['state'], site['geoId'], site['value'], site.get('updatedAt')) for site in sites],
+        defer=True,
+    )
+
+
+sites = _load_sites()
+enb_details = _load_enb_details()
+
+# RCA severities are kept under each site's sites.json id, whichever id a
+# request or an ingested sample uses.
+severity_index.set_aliases({
+    alias: site['id'] for site in sites for alias in (site.get('geoId'), site.get('enodeb')) if alias is not None
+})
+
+def _cache_metrics():
+    stats = result_cache.stats()
+    yield '# TYPE awsp_kpi_cache_events_total counter'
+    for event in ('hits', 'misses', 'evictions'):
+        yield f'awsp_kpi_cache_events_total{{event="{event}"}} {stats[event]}'
+    yield '# TYPE awsp_kpi_cache_entries gauge'
+    yield f'awsp_kpi_cache_entries {stats["size"]}'
+
+
+registry.add_collector(_cache_metrics)
+
+# Load the KPI dataset once at startup; requests are answered from memory.
+# A prebuilt snapshot (python snapshot.py) is mapped instead of parsed, and
+# the anomaly, offender and hierarchy indexes are replayed on first use.
+network_hierarchy.set_topology(enb_details.get('markets', []), enb_details.get('enbDetails', {}), sites)
+kpi_store.add_listener(_register_data_vocabulary)
+kpi_store.add_listener(lambda: anomaly_scorer.rebuild(kpi_store, defer=True))
+kpi_store.add_listener(_index_offenders)
+kpi_store.add_listener(lambda: network_hierarchy.rebuild(kpi_store, defer=True))
+kpi_store.load()
+
+# Index the shipped forecast file; unchanged files are skipped on restart.
+if FORECAST_CSV.exists():
+    forecast_store.ingest(FORECAST_CSV)
+
+# Viewport index over site coordinates, coloured by each site's latest RCA severity.
+site_grid.build(sites)
+severity_index.add_listener(lambda site_id, record: site_grid.set_severity(site_id, record.severity))
+severity_index.add_listener(lambda site_id, record: network_hierarchy.set_severity(site_id, record.severity))
+
+# Seed the RCA severity index so summaries are meaningful before any analysis.
+if sites:
+    perform_batch_rca_analysis(sites)
 
 
 @app.route('/assistant/prompt-query', methods=['POST'])
 def prompt_query():
     data = request.get_json(force=True)
     prompt = data.get('prompt', '')
-    intent = extract_intent(prompt)
-    result = get_kpi_data(intent)
-    return jsonify(result)
+    with stage('intent_parse'):
+        intent = extract_intent(prompt)
+    result = get_kpi_result(intent)
+    return series_response(result.response, result.meta(), result.series)
+
+
+def _realtime_disabled():
+    return jsonify({
+        'error': 'Ingest and streaming need a single server process; start Gunicorn with REALTIME_INGEST=1'
+    }), 503
+
+
+@app.route('/kpi/ingest', methods=['POST'])
+def kpi_ingest():
+    """Append a batch of KPI samples (kpi, geo, site_id, timestamp, value)"""
+    if not app.config['REALTIME_INGEST']:
+        return _realtime_disabled()
+    data = request.get_json(force=True)
+    samples = data.get('samples', []) if isinstance(data, dict) else data
+    
+    if not isinstance(samples, list) or not samples:
+        return jsonify({'error': 'A non-empty list of samples is required'}), 400
+    
+    try:
+        return jsonify(ingest_samples(samples))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/kpi/correlation', methods=['GET'])
+def kpi_correlation():
+    """Pairwise KPI correlation matrix for one eNodeB or market over a time window"""
+    if not request.args.get('enodeb') and not request.args.get('market'):
+        return jsonify({'error': 'enodeb or market is required'}), 400
+    return jsonify(get_correlation(
+        enodeb=request.args.get('enodeb'),
+        market=request.args.get('market'),
+        time=request.args.get('time', 'last 30 days'),
+        resolution=request.args.get('resolution')
+    ))
+
+
+@app.route('/kpi/top-offenders', methods=['GET'])
+def top_offenders():
+    """Worst n sites for a KPI in one market (geo), or across all markets"""
+    kpi = request.args.get('kpi')
+    if not kpi:
+        return jsonify({'error': 'kpi is required'}), 400
+    n = max(1, min(request.args.get('n', 10, type=int), 500))
+    geo = request.args.get('geo')
+    offenders = offender_index.top(kpi, geo, n)
+    return jsonify({'kpi': kpi, 'geo': geo, 'n': n, 'count': len(offenders), 'offenders': offenders})
+
+
+@app.route('/stream/kpi', methods=['GET'])
+def kpi_stream():
+    """Server-Sent Events feed of changed aggregates and RCA severities"""
+    if not app.config['REALTIME_INGEST']:
+        return _realtime_disabled()
+    filters = {field: request.args[field] for field in ('kpi', 'geo') if request.args.get(field)}
+    return broker.stream(filters)
 
 
 @app.route('/rca/analyze', methods=['POST'])
@@ -28,7 +194,42 @@ def rca_analyze():
         return jsonify({'error': 'Site data is required'}), 400
     
     try:
-        analysis = perform_rca_analysis(site_data)
+        with stage('rca'):
+            analysis = perform_rca_analysis(site_data)
+        return jsonify(analysis)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/rca/analyze-batch', methods=['POST'])
+def rca_analyze_batch():
+    """Perform Root Cause Analysis on many sites in one request"""
+    data = request.get_json(force=True)
+    sites = data.get('sites', []) if isinstance(data, dict) else data
+    
+    if not isinstance(sites, list) or not sites:
+        return jsonify({'error': 'A non-empty list of sites is required'}), 400
+    
+    try:
+        with stage('rca'):
+            results = perform_batch_rca_analysis(sites)
+        return jsonify({'count': len(results), 'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/rca/analyze-site', methods=['POST'])
+def rca_analyze_site():
+    """Perform one Root Cause Analysis across all sectors and KPIs of a site"""
+    data = request.get_json(force=True)
+    site_data = data.get('site', {})
+    
+    if not site_data:
+        return jsonify({'error': 'Site data is required'}), 400
+    
+    try:
+        with stage('rca'):
+            analysis = perform_site_rca_analysis(site_data)
         return jsonify(analysis)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -39,9 +240,11 @@ def rca_summary():
     """Get RCA summary for multiple sites"""
     data = request.get_json(force=True)
     site_ids = data.get('site_ids', [])
+    market = data.get('market')
     
     try:
-        summary = get_rca_summary(site_ids)
+        with stage('rca'):
+            summary = get_rca_summary(site_ids, market)
         return jsonify(summary)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -57,9 +260,18 @@ def next_best_action():
     if not site_data:
         return jsonify({'error': 'Site data is required'}), 400
     
+    # The ETag is derived from the analysis inputs, so a poll for an
+    # unchanged site is answered before any RCA work is done
+    etag = analysis_etag(site_data)
+    if etag is not None and etag in request.if_none_match:
+        not_modified = app.response_class(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
+
     try:
         # Perform RCA first to get recommendations
-        analysis = perform_rca_analysis(site_data)
+        with stage('rca'):
+            analysis = perform_cached_rca_analysis(site_data)
         
         # Format as next best action response
         recommendations = analysis.get('recommendations', [])
@@ -84,11 +296,69 @@ def next_best_action():
             }
         }
         
-        return jsonify(response)
+        response = jsonify(response)
+        if etag is not None:
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/forecast/<int:enodeb>', methods=['GET'])
+def forecast(enodeb):
+    """Anomaly scores for one eNodeB, by time range or top-N most anomalous"""
+    top = request.args.get('top', type=int)
+    window = dict(start=request.args.get('start'), end=request.args.get('end'), top=top)
+    order = 'anomaly_score' if top else '_DAY'
+
+    def payload():
+        points = forecast_store.query(enodeb, **window)
+        return {'enodeb': enodeb, 'count': len(points), 'order': order, 'points': points}
+
+    def series():
+        days, scores = forecast_store.query_columns(enodeb, **window)
+        return [Series('anomaly_score', days, scores)]
+
+    return series_response(payload, {'enodeb': enodeb, 'order': order}, series)
+
+
+@app.route('/anomaly/top', methods=['GET'])
+def anomaly_top():
+    """Series currently furthest from their own baseline"""
+    n = max(1, min(request.args.get('n', 20, type=int), 1000))
+    points = anomaly_scorer.most_anomalous(n, kpi=request.args.get('kpi'))
+    return jsonify({'count': len(points), 'points': points})
+
+
+@app.route('/anomaly/<enodeb>', methods=['GET'])
+def anomaly(enodeb):
+    """Live anomaly score of each KPI of one eNodeB, scored against its baseline"""
+    points = anomaly_scorer.scores_for_site(enodeb)
+    return jsonify({'enodeb': enodeb, 'count': len(points), 'points': points})
+
+
+@app.route('/sites/in-bbox', methods=['GET'])
+def sites_in_bbox():
+    """Sites inside a map viewport; clustered by zoom unless few enough to send as-is"""
+    try:
+        bbox = parse_bbox(request.args.get('bbox', ''))
+    except ValueError:
+        return jsonify({'error': 'bbox must be west,south,east,north'}), 400
+    zoom = request.args.get('zoom', 5, type=int)
+    return jsonify({'bbox': list(bbox), 'zoom': zoom, **site_grid.query(bbox, zoom)})
+
+
+@app.route('/hierarchy', methods=['GET'])
+@app.route('/hierarchy/<path:node>', methods=['GET'])
+def hierarchy(node=''):
+    """Pre-aggregated KPI stats and health of a market/site/eNB/sector node and its children"""
+    result = network_hierarchy.get([part for part in node.split('/') if part])
+    if result is None:
+        return jsonify({'error': f'Unknown hierarchy node: {node}'}), 404
+    return jsonify(result)
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -98,9 +368,17 @@ def health_check():
             'rca_engine': 'active',
             'kpi_engine': 'active',
             'intent_parser': 'active'
-        }
+        },
+        'kpi_cache': result_cache.stats(),
+        'anomaly_series': len(anomaly_scorer),
+        'stream_subscribers': broker.subscriber_count
     })
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:app` under load.
+    app.run(
+        host='0.0.0.0',
+        port=int(os.environ.get('PORT', 5000)),
+        debug=os.environ.get('FLASK_DEBUG', '1') == '1'
+    )
@@ -0,0 +1,242 @@
+"""Benchmarks for the server hot paths.
+
+Generates synthetic KPI datasets and site lists shaped like
+``src/data/sites.json``, then measures per-function latency percentiles,
+end-to-end request throughput through the Flask test client and peak
+memory. Results are written as JSON so runs can be compared over time::
+
+    python benchmark.py --output bench.json
+    python benchmark.py --rows 10000 1000000 --sites 1000 --output quick.json
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+KPIS = ["CQI", "Latency", "Throughput", "RSRQ (dB)", "RSRP (dBm)", "Bearer Drop Rate", "RRC Setup Failure Rate"]
+MARKETS = ["Dallas", "Oklahoma City", "Chicago", "St Louis", "Tampa"]
+MARKET_CENTERS = {
+    "Dallas": (32.78, -96.80), "Oklahoma City": (35.47, -97.52), "Chicago": (41.88, -87.63),
+    "St Louis": (38.63, -90.20), "Tampa": (27.95, -82.46),
+}
+VALUE_RANGES = {
+    "CQI": (1, 15), "Latency": (20, 150), "Throughput": (5, 500), "RSRQ (dB)": (-20, -3),
+    "RSRP (dBm)": (-125, -70), "Bearer Drop Rate": (0, 8), "RRC Setup Failure Rate": (0, 20),
+}
+KPI_TYPES = ["Top n Offenders", "Heavy Hitters", "High Runners", "Micro/Macro Outage", "Broken Trends", "Sleepy Cells"]
+PROMPTS = [
+    "Why is CQI bad in Dallas?",
+    "latency in Oklahoma last 3 days",
+    "throughput in chicago this week",
+    "rsrq in st louis yesterday",
+    "bearer drop rate tampa today",
+]
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    """Latency percentiles (microseconds) and throughput for repeated calls."""
+    fn()  # warm up
+    samples = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples[i] = time.perf_counter_ns() - t0
+    elapsed = time.perf_counter() - start
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99]) / 1000
+    return {
+        "iterations": iterations,
+        "mean_us": round(samples.mean() / 1000, 2),
+        "p50_us": round(p50, 2),
+        "p90_us": round(p90, 2),
+        "p99_us": round(p99, 2),
+        "max_us": round(samples.max() / 1000, 2),
+        "ops_per_sec": round(iterations / elapsed, 1),
+    }
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peak_memory(fn: Callable[[], Any]) -> Dict[str, Any]:
+    """Run ``fn`` once; returns wall time and how far it raised peak RSS.
+
+    Peak RSS only grows, so run workloads in increasing size order.
+    tracemalloc is avoided because it slows NumPy-heavy code several-fold.
+    """
+    before = _max_rss_mb()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    return {"result": result, "seconds": round(elapsed, 3), "peak_rss_growth_mb": round(_max_rss_mb() - before, 1)}
+
+
+def synthetic_kpi_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """KPI rows with the sample_kpi.csv columns spread over 90 days of hourly samples."""
+    rng = np.random.default_rng(seed)
+    kpi = rng.integers(len(KPIS), size=rows)
+    lows = np.array([VALUE_RANGES[k][0] for k in KPIS])
+    highs = np.array([VALUE_RANGES[k][1] for k in KPIS])
+    start = np.datetime64("2024-04-01T00:00:00")
+    return pd.DataFrame({
+        "kpi": pd.Categorical.from_codes(kpi, KPIS),
+        "geo": pd.Categorical.from_codes(rng.integers(len(MARKETS), size=rows), MARKETS),
+        "date": start + rng.integers(90 * 24, size=rows).astype("timedelta64[h]"),
+        "site_id": rng.integers(10000, 10000 + max(rows // 500, 10), size=rows).astype(str),
+        "value": rng.uniform(lows[kpi], highs[kpi]).round(2),
+    })
+
+
+def synthetic_sites(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Site records with the same fields as src/data/sites.json."""
+    rng = np.random.default_rng(seed)
+    sites = []
+    for i in range(count):
+        market = MARKETS[i % len(MARKETS)]
+        kpi = KPIS[rng.integers(len(KPIS))]
+        low, high = VALUE_RANGES[kpi]
+        lat, lng = MARKET_CENTERS[market]
+        sites.append({
+            "id": i + 1,
+            "geoId": f"{market[:3].upper()}{i + 1:03d}",
+            "enodeb": int(rng.integers(10000, 99999)),
+            "sector": int(rng.integers(1, 4)),
+            "carrier": int(rng.integers(1, 8)),
+            "kpi": kpi,
+            "value": round(float(rng.uniform(low, high)), 2),
+            "kpiType": KPI_TYPES[i % len(KPI_TYPES)],
+            "severity": int(rng.integers(1, 6)),
+            "updatedAt": "2025-06-08 02:11",
+            "lat": round(lat + float(rng.normal(0, 0.3)), 6),
+            "lng": round(lng + float(rng.normal(0, 0.3)), 6),
+            "sectorInfo": [
+                {"cellId": f"CELL{int(rng.integers(1000, 9999))}", "band": "B2", "azimuth": az,
+                 "cl": int(rng.integers(60, 150)), "edt": "No", "tilt": "2°"}
+                for az in (0, 120, 240)
+            ],
+            "state": market,
+        })
+    return sites
+
+
+def bench_kpi(rows: int, iterations: int) -> Dict[str, Any]:
+    from intent_parser import extract_intent
+    from kpi_engine import _build_kpi_response, get_kpi_data, kpi_store, result_cache
+
+    frame = synthetic_kpi_frame(rows)
+    kpi_store.check_interval = float("inf")  # keep the synthetic data resident
+    load = peak_memory(lambda: kpi_store.load_frame(frame))
+    prompts = itertools.cycle(PROMPTS)
+    intents = itertools.cycle([extract_intent(p) for p in PROMPTS])
+
+    def uncached():
+        intent = next(intents)
+        return _build_kpi_response(intent["kpi"], intent["geo"], intent["time"])
+
+    result_cache.clear()
+    return {
+        "rows": rows,
+        "store_build": {"seconds": load["seconds"], "peak_rss_growth_mb": load["peak_rss_growth_mb"]},
+        "extract_intent": measure(lambda: extract_intent(next(prompts)), iterations),
+        "get_kpi_data_uncached": measure(uncached, iterations),
+        "get_kpi_data_cached": measure(lambda: get_kpi_data(next(intents)), iterations),
+    }
+
+
+def bench_rca(count: int, iterations: int) -> Dict[str, Any]:
+    from rca_engine import rca_engine
+
+    sites = synthetic_sites(count)
+    batch = peak_memory(lambda: rca_engine.analyze_batch(sites))
+    cycle = itertools.cycle(sites)
+    single = measure(lambda: rca_engine.analyze_kpi(next(cycle)), iterations)
+    return {
+        "sites": count,
+        "analyze_kpi": single,
+        "analyze_batch": {
+            "seconds": batch["seconds"],
+            "peak_rss_growth_mb": batch["peak_rss_growth_mb"],
+            "sites_per_sec": round(count / batch["seconds"], 1) if batch["seconds"] else None,
+        },
+    }
+
+
+def bench_routes(app, sites: List[Dict[str, Any]], iterations: int) -> Dict[str, Any]:
+    client = app.test_client()
+    site = sites[0]
+    prompts = itertools.cycle(PROMPTS)
+    routes = {
+        "POST /assistant/prompt-query": lambda: client.post(
+            "/assistant/prompt-query", json={"prompt": next(prompts)}),
+        "POST /rca/analyze": lambda: client.post("/rca/analyze", json={"site": site}),
+        "POST /rca/summary": lambda: client.post("/rca/summary", json={"site_ids": [s["id"] for s in sites[:100]]}),
+        "POST /recommendations/next-best-action": lambda: client.post(
+            "/recommendations/next-best-action", json={"site": site}),
+        "GET /health": lambda: client.get("/health"),
+    }
+    results = {name: measure(fn, iterations) for name, fn in routes.items()}
+    batch = sites[:1000]
+    results["POST /rca/analyze-batch (1000 sites)"] = measure(
+        lambda: client.post("/rca/analyze-batch", json={"sites": batch}), max(iterations // 100, 5))
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000],
+                        help="synthetic KPI dataset sizes")
+    parser.add_argument("--sites", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="synthetic site list sizes")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per latency measurement")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Run server startup first so it doesn't replace the synthetic datasets.
+    from app import app
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+        },
+        "kpi": [bench_kpi(rows, args.iterations) for rows in args.rows],
+        "rca": [bench_rca(count, args.iterations) for count in args.sites],
+        "routes": bench_routes(app, synthetic_sites(1000), args.iterations),
+    }
+    results["meta"]["max_rss_mb"] = round(_max_rss_mb(), 1)
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from kpi_engine import kpi_store
+from metrics import stage
+from result_cache import TTLCache
+from rollups import RESOLUTIONS
+from time_window import resolve_window
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DAY_SECONDS = 86400
+MIN_SAMPLES = 3
+
+# ("market", geo) or ("enodeb", site_id)
+Scope = Tuple[str, str]
+# Co-moment sums over time buckets where both KPIs of a pair have data.
+Moments = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+# Per-day moments keyed on (scope, kpis, resolution, epoch day). Days are
+# additive, so a window is the sum of its days; ingest drops only the days
+# it touched and a reload drops everything.
+moment_cache = TTLCache(
+    maxsize=int(os.environ.get("CORRELATION_CACHE_SIZE", 50_000)),
+    ttl=float(os.environ.get("CORRELATION_CACHE_TTL", 3600)),
+)
+kpi_store.add_listener(moment_cache.clear)
+
+
+def _scope_series(scope: Scope) -> List[Tuple[str, str, Optional[str]]]:
+    """Rollup keys of every KPI measured in the scope, one per KPI."""
+    kind, name = scope
+    keys: Dict[str, Tuple[str, str, Optional[str]]] = {}
+    for kpi, geo in sorted(kpi_store.series):
+        if kpi in keys:
+            continue
+        if kind == "market" and geo == name:
+            keys[kpi] = (kpi, geo, None)
+        elif kind == "enodeb" and len(kpi_store.rollups.buckets(kpi, geo, name)[0]):
+            keys[kpi] = (kpi, geo, name)
+    return list(keys.values())
+
+
+def _aligned(keys: Sequence[Tuple[str, str, Optional[str]]], resolution: str, lo: int, hi: int):
+    """Per-bucket KPI means as a (kpis × buckets) matrix plus a presence mask."""
+    frames = []
+    for kpi, geo, site in keys:
+        ids, counts, sums = kpi_store.rollups.buckets(kpi, geo, site, resolution, lo, hi)
+        frames.append((ids, sums / counts))
+    ids = np.unique(np.concatenate([f[0] for f in frames])) if frames else np.empty(0, dtype=np.int64)
+    values = np.zeros((len(keys), len(ids)))
+    mask = np.zeros((len(keys), len(ids)))
+    for row, (kpi_ids, means) in enumerate(frames):
+        cols = np.searchsorted(ids, kpi_ids)
+        values[row, cols] = means
+        mask[row, cols] = 1.0
+    return values, mask
+
+
+def _moments(keys, resolution: str, lo: int, hi: int) -> Moments:
+    values, mask = _aligned(keys, resolution, lo, hi)
+    weighted = values * mask
+    n = mask @ mask.T
+    sx = weighted @ mask.T  # sx[i, j]: sum of KPI i where j is also present
+    sxx = (weighted * values) @ mask.T
+    sxy = weighted @ weighted.T
+    return n, sx, sxx, sxy
+
+
+def _day_moments(scope: Scope, keys, resolution: str, day: int) -> Moments:
+    cache_key = (scope, tuple(k[0] for k in keys), resolution, day)
+    moments = moment_cache.get(cache_key)
+    if moments is None:
+        width = RESOLUTIONS[resolution]
+        moments = _moments(keys, resolution, day * DAY_SECONDS // width, (day + 1) * DAY_SECONDS // width)
+        moment_cache.set(cache_key, moments)
+    return moments
+
+
+def _pearson(moments: Moments) -> np.ndarray:
+    n, sx, sxx, sxy = moments
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sx.T
+        var_x = n * sxx - sx * sx
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[(n < MIN_SAMPLES) | ~np.isfinite(corr)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def invalidate(df: "pd.DataFrame") -> int:
+    """Drop cached days touched by ingested samples (kpi, geo, site_id, date)."""
+    scopes = {("market", geo) for geo in df["geo"].unique()}
+    scopes |= {("enodeb", site) for site in df["site_id"].unique() if site}
+    days = set((df["date"].to_numpy(dtype="datetime64[s]").astype(np.int64) // DAY_SECONDS).tolist())
+    return moment_cache.discard_where(lambda key: key[0] in scopes and key[3] in days)
+
+
+def _timestamp(seconds: int) -> str:
+    return str(np.datetime64(seconds, "s")).replace("T", " ")
+
+
+def _canonical_market(market: str) -> str:
+    for _, geo in kpi_store.series:
+        if geo.lower() == market.lower():
+            return geo
+    return market
+
+
+def get_correlation(
+    enodeb: Optional[str] = None,
+    market: Optional[str] = None,
+    time: str = "last 30 days",
+    resolution: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Pairwise Pearson correlation of every KPI of one eNodeB or market.
+
+    KPIs are aligned on hourly or daily rollup buckets; each pair uses the
+    buckets where both have data. Only whole days inside the window are
+    served from the moment cache, partial edge days are computed directly.
+    """
+    kpi_store.maybe_reload()
+    scope: Scope = ("enodeb", str(enodeb)) if enodeb else ("market", _canonical_market(market or "Dallas"))
+    start, end, default_resolution = resolve_window(time, kpi_store.latest)
+    resolution = resolution if resolution in RESOLUTIONS else default_resolution
+
+    with stage("data_load"):
+        keys = _scope_series(scope)
+        width = RESOLUTIONS[resolution]
+        first_seconds, last_seconds = [], []
+        for key in keys:
+            ids = kpi_store.rollups.buckets(*key, resolution)[0]
+            if len(ids):
+                first_seconds.append(int(ids[0]) * width)
+                last_seconds.append((int(ids[-1]) + 1) * width)
+        lo = int(start.astype(np.int64)) if start is not None else min(first_seconds, default=0)
+        hi = int(end.astype(np.int64)) if end is not None else max(last_seconds, default=0)
+
+    with stage("aggregate"):
+        total = tuple(np.zeros((len(keys), len(keys))) for _ in range(4))
+        first_day, last_day = -(-lo // DAY_SECONDS), hi // DAY_SECONDS
+        for day in range(first_day, last_day):
+            total = tuple(a + b for a, b in zip(total, _day_moments(scope, keys, resolution, day)))
+        edges = [(lo, min(hi, first_day * DAY_SECONDS)), (max(lo, last_day * DAY_SECONDS), hi)]
+        if first_day > last_day:
+            edges = [(lo, hi)]
+        for edge_lo, edge_hi in edges:
+            if edge_lo < edge_hi:
+                partial = _moments(keys, resolution, edge_lo // width, -(-edge_hi // width))
+                total = tuple(a + b for a, b in zip(total, partial))
+        corr = _pearson(total)
+
+    return {
+        "scope": scope[0],
+        "id": scope[1],
+        "resolution": resolution,
+        "window": {"start": _timestamp(lo), "end": _timestamp(hi)} if keys else None,
+        "kpis": [key[0] for key in keys],
+        "matrix": [[None if np.isnan(r) else round(float(r), 4) for r in row] for row in corr],
+        "samples": total[0].astype(int).tolist(),
+    }
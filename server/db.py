@@ -0,0 +1,49 @@
+from __future__ import annotations
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class ConnectionPool:
+    """One long-lived SQLite connection per thread.
+
+    Connections open in WAL mode so readers never block each other or the
+    loader. ``reset()`` makes every thread reconnect on its next checkout,
+    e.g. after the database file has been replaced.
+    """
+
+    def __init__(self, db_path: Path, schema: str = ""):
+        self.db_path = db_path
+        self.schema = schema
+        self._local = threading.local()
+        self._generation = 0
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None or local.generation != self._generation:
+            if conn is not None:
+                conn.close()
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            local.conn = conn
+            local.generation = self._generation
+        if self.schema and not self._schema_ready:
+            with self._lock:
+                conn.executescript(self.schema)
+                self._schema_ready = True
+        return conn
+
+    def close(self) -> None:
+        """Close the calling thread's connection, e.g. before forking workers."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def reset(self) -> None:
+        self._generation += 1
+        self._schema_ready = False
@@ -0,0 +1,174 @@
+"""Content negotiation for chart and time-series responses.
+
+JSON stays the default. Clients can opt into a packed binary layout
+(``application/vnd.awsp.series``), or Arrow IPC when pyarrow is installed,
+through ``Accept``. Either body is gzip- or brotli-compressed when
+``Accept-Encoding`` allows it.
+
+Packed layout, little-endian::
+
+    b"AWSS" | u8 version | 3 pad bytes | u32 header length | header JSON
+    then per series: int32 date deltas[count] | float32 values[count]
+
+The header JSON is space-padded to a multiple of 4 bytes, so every array
+starts 4-byte aligned and can be read in place as an ``Int32Array`` or
+``Float32Array``. For each series the header gives ``name``, ``count``,
+``start`` (epoch seconds) and ``unit`` (seconds per delta step). Each
+date is ``start + delta * unit``.
+"""
+
+import gzip
+import json
+import struct
+import zlib
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+from metrics import stage
+
+SERIES_MIMETYPE = "application/vnd.awsp.series"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+MAGIC = b"AWSS"
+VERSION = 1
+# Smaller bodies are not worth the compression overhead.
+MIN_COMPRESS_BYTES = 1024
+
+
+class Series(NamedTuple):
+    name: str
+    timestamps: np.ndarray  # epoch seconds, int64
+    values: np.ndarray
+    unit: int = 1  # seconds per delta step
+
+
+def _header(meta: Dict[str, Any], series: Sequence[Series]) -> bytes:
+    descriptors = []
+    for s in series:
+        descriptors.append({
+            "name": s.name,
+            "count": int(len(s.values)),
+            "start": int(s.timestamps[0]) if len(s.timestamps) else None,
+            "unit": s.unit,
+        })
+    header = json.dumps({**meta, "series": descriptors}, separators=(",", ":")).encode()
+    return header + b" " * (-len(header) % 4)
+
+
+def pack_chunks(meta: Dict[str, Any], series: Sequence[Series]) -> Iterator[bytes]:
+    """Yield the packed body piece by piece, one chunk per array."""
+    header = _header(meta, series)
+    yield MAGIC + struct.pack("<B3xI", VERSION, len(header)) + header
+    for s in series:
+        timestamps = np.asarray(s.timestamps, dtype=np.int64)
+        deltas = (timestamps - timestamps[0]) // s.unit if len(timestamps) else timestamps
+        yield np.ascontiguousarray(deltas, dtype="<i4").tobytes()
+        yield np.ascontiguousarray(s.values, dtype="<f4").tobytes()
+
+
+def arrow_chunks(meta: Dict[str, Any], series: Sequence[Series]) -> Iterator[bytes]:
+    """One Arrow record batch (timestamp[s], float32) per series, in header order."""
+    schema = pyarrow.schema(
+        [("timestamp", pyarrow.timestamp("s")), ("value", pyarrow.float32())],
+        metadata={"meta": json.dumps({**meta, "series": [s.name for s in series]})},
+    )
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for s in series:
+            writer.write_batch(pyarrow.record_batch([
+                pyarrow.array(np.asarray(s.timestamps, dtype="datetime64[s]")),
+                pyarrow.array(np.asarray(s.values, dtype=np.float32)),
+            ], schema=schema))
+    yield sink.getvalue().to_pybytes()
+
+
+def negotiate_binary() -> Optional[str]:
+    """The binary mimetype the client prefers over JSON, if any."""
+    accepted = request.accept_mimetypes
+    offers = [SERIES_MIMETYPE] + ([ARROW_MIMETYPE] if pyarrow is not None else [])
+    best = max(offers, key=lambda offer: accepted[offer])
+    return best if accepted[best] > accepted["application/json"] else None
+
+
+def negotiate_encoding() -> Optional[str]:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=4)
+        for chunk in chunks:
+            yield compressor.process(bytes(chunk))
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+def series_response(
+    payload: Union[Dict[str, Any], Callable[[], Dict[str, Any]]],
+    meta: Dict[str, Any],
+    series: Union[Sequence[Series], Callable[[], Sequence[Series]]],
+) -> Response:
+    """Answer with ``payload`` as JSON, or ``meta`` plus ``series`` in a binary format.
+
+    ``payload`` and ``series`` may be callables so that only the negotiated
+    representation is built.
+    Binary bodies are streamed one array at a time, so a large series is
+    never assembled into a single buffer or turned into Python objects.
+    """
+    encoding = negotiate_encoding()
+    mimetype = negotiate_binary()
+    if mimetype is None:
+        body = current_app.json.dumps(payload() if callable(payload) else payload).encode()
+        if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+            response = Response(body, mimetype="application/json")
+        else:
+            with stage("compress"):
+                body = gzip.compress(body, 6) if encoding == "gzip" else brotli.compress(body, quality=4)
+            response = Response(body, mimetype="application/json", headers={"Content-Encoding": encoding})
+    else:
+        series = series() if callable(series) else series
+        chunks = (pack_chunks if mimetype == SERIES_MIMETYPE else arrow_chunks)(meta, series)
+        if encoding is not None:
+            chunks = _compress(chunks, encoding)
+        response = Response(chunks, mimetype=mimetype, headers={"Content-Encoding": encoding} if encoding else None)
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
+
+
+def unpack(body: bytes) -> Dict[str, Any]:
+    """Decode a packed body (for tests and Python clients); arrays are views on ``body``."""
+    if body[:4] != MAGIC:
+        raise ValueError("not a packed series body")
+    _, header_len = struct.unpack_from("<B3xI", body, 4)
+    offset = 12 + header_len
+    decoded = json.loads(body[12:offset])
+    for descriptor in decoded["series"]:
+        count = descriptor["count"]
+        deltas = np.frombuffer(body, dtype="<i4", count=count, offset=offset)
+        offset += 4 * count
+        descriptor["values"] = np.frombuffer(body, dtype="<f4", count=count, offset=offset)
+        offset += 4 * count
+        start = descriptor["start"] or 0
+        descriptor["timestamps"] = start + deltas.astype(np.int64) * descriptor["unit"]
+    return decoded
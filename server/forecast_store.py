@@ -0,0 +1,141 @@
+from __future__ import annotations
+import csv
+import os
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from db import ConnectionPool
+
+FORECAST_CSV = Path(__file__).resolve().parent.parent / "public" / "graphs" / "FORECAST_granular_predictions.csv"
+FORECAST_DB = Path(__file__).with_name("forecast.db")
+
+# Every score row records the file it came from, so re-ingesting a changed
+# file replaces its rows.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecast_files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS forecast_scores (
+    source_id INTEGER NOT NULL REFERENCES forecast_files (id),
+    enodeb INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    anomaly_score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_forecast_scores_source ON forecast_scores (source_id);
+CREATE INDEX IF NOT EXISTS idx_forecast_scores_enodeb_day ON forecast_scores (enodeb, day);
+CREATE INDEX IF NOT EXISTS idx_forecast_scores_enodeb_score ON forecast_scores (enodeb, anomaly_score);
+"""
+
+
+class ForecastStore:
+    """Per-eNodeB, time-indexed anomaly scores backed by SQLite.
+
+    Forecast CSVs (``_DAY,ENODEB,anomaly_score``) are stream-parsed in chunks,
+    so neither ingestion nor lookups ever hold a whole file in memory.
+    """
+
+    def __init__(self, db_path: Path = FORECAST_DB, chunk_size: int = 10_000):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.pool = ConnectionPool(db_path, SCHEMA)
+
+    def ingest(self, csv_path: Path, force: bool = False) -> int:
+        """Load a forecast CSV; files already ingested unchanged are skipped.
+
+        A changed (or forced) file replaces the rows it loaded before, in
+        the same transaction, so readers never see both versions.
+        """
+        csv_path = Path(csv_path).resolve()
+        mtime_ns = os.stat(csv_path).st_mtime_ns
+        conn = self.pool.connection()
+        seen = conn.execute(
+            "SELECT mtime_ns FROM forecast_files WHERE path=?", (str(csv_path),)
+        ).fetchone()
+        if seen is not None and seen[0] == mtime_ns and not force:
+            return 0
+
+        rows = 0
+        with open(csv_path, newline="") as f, conn:
+            conn.execute(
+                "INSERT INTO forecast_files (path, mtime_ns, rows) VALUES (?, ?, 0) "
+                "ON CONFLICT (path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+                (str(csv_path), mtime_ns),
+            )
+            source_id = conn.execute("SELECT id FROM forecast_files WHERE path=?", (str(csv_path),)).fetchone()[0]
+            conn.execute("DELETE FROM forecast_scores WHERE source_id=?", (source_id,))
+            reader = csv.DictReader(f)
+            records = ((source_id, int(r["ENODEB"]), r["_DAY"], float(r["anomaly_score"])) for r in reader)
+            while True:
+                chunk = list(islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                conn.executemany(
+                    "INSERT INTO forecast_scores (source_id, enodeb, day, anomaly_score) VALUES (?, ?, ?, ?)", chunk
+                )
+                rows += len(chunk)
+            conn.execute("UPDATE forecast_files SET rows=? WHERE id=?", (rows, source_id))
+        return rows
+
+    def query(
+        self,
+        enodeb: int,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        top: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Scores for one eNodeB, by time or as the ``top`` most anomalous.
+
+        ``start``/``end`` accept ``YYYY-MM-DD`` or ``YYYY-MM-DD HH:MM:SS``;
+        a date-only ``end`` includes that whole day. Lower scores are more
+        anomalous.
+        """
+        rows = self._rows(enodeb, start, end, top)
+        return [{"_DAY": day, "anomaly_score": score} for day, score in rows]
+
+    def query_columns(
+        self,
+        enodeb: int,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        top: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Same as ``query`` as (epoch seconds, scores) arrays, for binary responses."""
+        rows = self._rows(enodeb, start, end, top)
+        days = np.array([day for day, _ in rows], dtype="datetime64[s]").astype(np.int64)
+        return days, np.fromiter((score for _, score in rows), dtype=np.float64, count=len(rows))
+
+    def _rows(self, enodeb: int, start: Optional[str], end: Optional[str], top: Optional[int]) -> List[Tuple[str, float]]:
+        clauses, params = ["enodeb = ?"], [enodeb]
+        if start:
+            clauses.append("day >= ?")
+            params.append(start)
+        if end:
+            clauses.append("day <= ?")
+            params.append(end + " 23:59:59" if len(end) == 10 else end)
+        sql = f"SELECT day, anomaly_score FROM forecast_scores WHERE {' AND '.join(clauses)}"
+        if top:
+            sql += " ORDER BY anomaly_score LIMIT ?"
+            params.append(int(top))
+        else:
+            sql += " ORDER BY day"
+        return self.pool.connection().execute(sql, params).fetchall()
+
+
+forecast_store = ForecastStore()
+
+
+def ingest_files(paths: Iterable[Path]) -> Dict[str, int]:
+    return {str(path): forecast_store.ingest(path) for path in paths}
+
+
+if __name__ == "__main__":
+    # python forecast_store.py [forecast.csv ...]
+    for path, rows in ingest_files(sys.argv[1:] or [FORECAST_CSV]).items():
+        print(f"{path}: {rows} rows ingested")
@@ -0,0 +1,68 @@
+# Gunicorn settings for the assistant/RCA API.
+# Every value can be overridden through the environment variables below.
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+# Threaded workers: pandas/NumPy and SQLite release the GIL for the heavy
+# parts, and most requests are answered from in-memory caches.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WORKER_THREADS', 4))
+
+# /kpi/ingest and /stream/kpi keep ingested samples, severities and SSE
+# subscribers in process memory. They are enabled only with
+# REALTIME_INGEST=1, which needs a single worker that is never recycled
+# (see on_starting below); size WORKER_THREADS for the open streams.
+realtime_ingest = os.environ.get('REALTIME_INGEST') == '1'
+if realtime_ingest:
+    workers = 1
+
+# Load data and compile rules once in the master; forked workers share the
+# pages copy-on-write. The master keeps the app it preloaded, so SIGHUP only
+# respawns workers from it: deploy new code with a restart or USR2 upgrade.
+# PRELOAD_APP=0 makes each worker import the app itself, so SIGHUP reloads
+# code at the cost of that sharing.
+preload_app = os.environ.get('PRELOAD_APP', '1') != '0'
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('WORKER_TIMEOUT', 60))
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth from caches. Never
+# with realtime ingest: a recycled worker would drop everything ingested.
+max_requests = 0 if realtime_ingest else int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('ACCESS_LOG', '-') or None
+
+
+def on_starting(server):
+    # Command-line flags (-w, --max-requests) override the values above.
+    if realtime_ingest and (server.cfg.workers != 1 or server.cfg.max_requests):
+        raise RuntimeError('REALTIME_INGEST=1 needs exactly one worker and max_requests = 0')
+
+
+def when_ready(server):
+    # SQLite connections must not be shared across fork; drop the ones the
+    # master opened while preloading so each worker thread opens its own.
+    from forecast_store import forecast_store
+
+    forecast_store.pool.close()
+
+
+def post_worker_init(worker):
+    # Replay the KPI history into the anomaly, offender and hierarchy indexes
+    # off the request path; a request that needs one first waits for it.
+    import threading
+
+    from anomaly import anomaly_scorer
+    from hierarchy import network_hierarchy
+    from offenders import offender_index
+
+    def build():
+        for index in (anomaly_scorer, offender_index, network_hierarchy):
+            index.catch_up()
+
+    threading.Thread(target=build, name='index-warmup', daemon=True).start()
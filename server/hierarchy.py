@@ -0,0 +1,288 @@
+from __future__ import annotations
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from severity_index import SEVERITY_RANK
+
+LEVELS = ("network", "market", "site", "enb", "sector")
+SEVERITY_NAMES = {rank: name for name, rank in SEVERITY_RANK.items()}
+# Share of a node's health each severity keeps; the health score is the
+# weighted mean over every node with a known severity in the subtree.
+HEALTH_WEIGHTS = {"minor": 1.0, "major": 0.5, "critical": 0.0}
+_WEIGHTS = [HEALTH_WEIGHTS[SEVERITY_NAMES[rank]] for rank in range(len(SEVERITY_NAMES))]
+
+# enb_details.json sector fields and the KPI names used everywhere else;
+# fields not listed keep their own name.
+SECTOR_KPIS = {
+    "cqi": "CQI",
+    "drops": "Bearer Drop Rate",
+    "throughput": "DL Throughput (Mbps)",
+    "prbUtil": "PRB Utilization (%)",
+}
+
+Path = Tuple[str, ...]
+# (market, site id, kpi, count, sum, min, max); an empty site id is the market itself
+Aggregate = Tuple[str, str, str, int, float, float, float]
+
+
+class _Stats:
+    __slots__ = ("count", "total", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def add(self, count: int, total: float, low: float, high: float) -> None:
+        self.count += count
+        self.total += total
+        self.low = min(self.low, low)
+        self.high = max(self.high, high)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "min": self.low if self.count else None,
+            "max": self.high if self.count else None,
+        }
+
+
+class _Node:
+    __slots__ = ("path", "parent", "children", "stats", "severity", "severity_counts")
+
+    def __init__(self, path: Path, parent: Optional[_Node]):
+        self.path = path
+        self.parent = parent
+        self.children: Dict[str, _Node] = {}
+        self.stats: Dict[str, _Stats] = {}
+        # This node's own severity rank, and counts of ranks over the subtree.
+        self.severity: Optional[int] = None
+        self.severity_counts = [0] * len(SEVERITY_NAMES)
+
+    @property
+    def level(self) -> str:
+        return LEVELS[min(len(self.path), len(LEVELS) - 1)]
+
+    def ancestry(self) -> Iterable[_Node]:
+        node = self
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def summary(self) -> Dict[str, Any]:
+        rated = sum(self.severity_counts)
+        worst = max((rank for rank, count in enumerate(self.severity_counts) if count), default=None)
+        return {
+            "name": self.path[-1] if self.path else "network",
+            "path": "/".join(self.path),
+            "level": self.level,
+            "children": len(self.children),
+            "worst_severity": SEVERITY_NAMES.get(worst),
+            "health_score": round(100 * sum(c * w for c, w in zip(self.severity_counts, _WEIGHTS)) / rated, 1)
+            if rated else None,
+            "severity_counts": {SEVERITY_NAMES[rank]: count for rank, count in enumerate(self.severity_counts)},
+            "kpis": {kpi: stats.to_dict() for kpi, stats in self.stats.items()},
+        }
+
+
+class NetworkHierarchy:
+    """Pre-aggregated KPI statistics for every market, site, eNodeB and sector.
+
+    Each node holds per-KPI count, sum, min and max over all samples in its
+    subtree, plus counts of its descendants' RCA severities. A sample or a
+    severity change walks from its node up to the root, so updates are
+    O(depth) and reading any node is a dictionary lookup.
+
+    The layout comes from ``enb_details.json`` and the map's sites; ids seen
+    only in KPI data are added as sites under their market.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topology: Tuple[Sequence[Dict[str, Any]], Dict[str, Any], Sequence[Dict[str, Any]]] = ([], {}, [])
+        self._severities: Dict[str, str] = {}
+        self._pending = None
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._root = _Node((), None)
+        self._nodes: Dict[Path, _Node] = {(): self._root}
+        self._aliases: Dict[str, _Node] = {}
+
+    def set_topology(
+        self, markets: Sequence[Dict[str, Any]], enb_details: Dict[str, Any], sites: Sequence[Dict[str, Any]]
+    ) -> None:
+        """Static layout (``enb_details.json``) and the map's sites (``sites.json``); applied on ``rebuild``."""
+        self._topology = (markets, enb_details, sites)
+
+    def rebuild(self, store=None, defer: bool = False) -> None:
+        """Rebuild from the topology and a KPIStore's history.
+
+        With ``defer`` the work waits for the first read or update, as in
+        ``AnomalyScorer.rebuild``. Recorded severities are kept.
+        """
+        self._pending = (store.series, store.site_ids) if store is not None else ({}, None)
+        if not defer:
+            self.catch_up()
+
+    def catch_up(self) -> None:
+        """Run a deferred ``rebuild`` now, if one is pending or in progress."""
+        if self._pending is None and not self._rebuilding:
+            return
+        with self._rebuild_lock:
+            if self._pending is None:
+                return
+            self._rebuilding = True
+            pending, self._pending = self._pending, None
+            try:
+                self._replay(pending)
+            finally:
+                self._rebuilding = False
+
+    def _replay(self, pending) -> None:
+        series_by_key, site_ids = pending
+        with self._lock:
+            self._reset()
+            self._apply_topology()
+            for (kpi, geo), series in series_by_key.items():
+                self._apply(_series_aggregates(kpi, geo, series, site_ids))
+            for site_id, severity in self._severities.items():
+                self._set_severity(site_id, severity)
+
+    def _apply_topology(self) -> None:
+        markets, enb_details, sites = self._topology
+        for market in markets:
+            for site in market.get("sites", []):
+                self._ensure((market["name"], site["id"]))
+                for enb in site.get("enbs", []):
+                    for sector in enb_details.get(str(enb), {}).get("sectors", []):
+                        node = self._ensure((market["name"], site["id"], str(enb), str(sector["id"])))
+                        for kpi, value in sector.get("kpis", {}).items():
+                            self._add(node, SECTOR_KPIS.get(kpi, kpi), 1, float(value), float(value), float(value))
+                    self._aliases.setdefault(str(enb), self._ensure((market["name"], site["id"], str(enb))))
+                self._aliases.setdefault(str(site["id"]), self._nodes[(market["name"], site["id"])])
+        for site in sites:
+            path = tuple(str(site[field]) for field in ("state", "geoId", "enodeb", "sector") if site.get(field) is not None)
+            node = self._ensure(path)
+            # geoId and eNodeB name their site and eNodeB nodes
+            for depth in (2, 3):
+                if len(path) >= depth:
+                    self._aliases.setdefault(path[depth - 1], self._nodes[path[:depth]])
+            if site.get("id") is not None:
+                self._aliases.setdefault(str(site["id"]), node)
+            value = _to_float(site.get("value"))
+            if site.get("kpi") is not None and not math.isnan(value):
+                self._add(node, str(site["kpi"]), 1, value, value, value)
+
+    def _ensure(self, path: Path) -> _Node:
+        node = self._nodes.get(path)
+        if node is None:
+            parent = self._ensure(path[:-1])
+            node = parent.children[path[-1]] = self._nodes[path] = _Node(path, parent)
+        return node
+
+    def _resolve(self, site_id: str, market: str) -> _Node:
+        if not site_id:
+            return self._ensure((market,))
+        node = self._aliases.get(site_id)
+        if node is None:
+            node = self._aliases[site_id] = self._ensure((market, site_id))
+        return node
+
+    def _add(self, node: _Node, kpi: str, count: int, total: float, low: float, high: float) -> None:
+        for ancestor in node.ancestry():
+            stats = ancestor.stats.get(kpi)
+            if stats is None:
+                stats = ancestor.stats[kpi] = _Stats()
+            stats.add(count, total, low, high)
+
+    def _apply(self, aggregates: Iterable[Aggregate]) -> None:
+        for market, site_id, kpi, count, total, low, high in aggregates:
+            self._add(self._resolve(str(site_id), str(market)), str(kpi), int(count), float(total), low, high)
+
+    def update_many(self, aggregates: Iterable[Aggregate]) -> None:
+        """Fold in (market, site_id, kpi, count, sum, min, max) per sample group."""
+        self.catch_up()
+        with self._lock:
+            self._apply(aggregates)
+
+    def update_frame(self, df) -> None:
+        """Fold in ingested samples (kpi, geo, site_id, value), one update per (site, KPI)."""
+        grouped = df.groupby(["geo", "site_id", "kpi"], sort=False)["value"].agg(["count", "sum", "min", "max"])
+        self.update_many(
+            (geo, site_id, kpi, count, total, low, high)
+            for (geo, site_id, kpi), count, total, low, high in zip(
+                grouped.index, grouped["count"], grouped["sum"], grouped["min"], grouped["max"])
+        )
+
+    def set_severity(self, site_id: Any, severity: Optional[str]) -> None:
+        """Record the current RCA severity of a site; ``site_id`` may be id, geoId or eNodeB."""
+        with self._lock:
+            self._severities[str(site_id)] = severity
+            # A pending rebuild replays every recorded severity.
+            if self._pending is None:
+                self._set_severity(str(site_id), severity)
+
+    def _set_severity(self, site_id: str, severity: Optional[str]) -> None:
+        node = self._aliases.get(site_id)
+        if node is None:
+            return
+        rank = SEVERITY_RANK.get(severity)
+        if rank == node.severity:
+            return
+        for ancestor in node.ancestry():
+            if node.severity is not None:
+                ancestor.severity_counts[node.severity] -= 1
+            if rank is not None:
+                ancestor.severity_counts[rank] += 1
+        node.severity = rank
+
+    def get(self, path: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        """A node's statistics with a summary of each child, or None if unknown."""
+        self.catch_up()
+        with self._lock:
+            node = self._nodes.get(tuple(path))
+            if node is None:
+                return None
+            result = node.summary()
+            result["severity"] = SEVERITY_NAMES.get(node.severity)
+            result["children"] = [child.summary() for child in node.children.values()]
+            return result
+
+
+def _series_aggregates(kpi: str, geo: str, series, site_ids) -> List[Aggregate]:
+    """Per-site (count, sum, min, max) of one KPIStore series."""
+    valid = ~np.isnan(series.values)
+    values, sites = series.values[valid], series.sites[valid]
+    if not len(values):
+        return []
+    codes, inverse = np.unique(sites, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse, minlength=len(codes))
+    sums = np.bincount(inverse, weights=values, minlength=len(codes))
+    lows = np.full(len(codes), np.inf)
+    highs = np.full(len(codes), -np.inf)
+    np.minimum.at(lows, inverse, values)
+    np.maximum.at(highs, inverse, values)
+    return [
+        (geo, site, kpi, count, total, low, high)
+        for site, count, total, low, high in zip(
+            site_ids[codes].tolist(), counts.tolist(), sums.tolist(), lows.tolist(), highs.tolist())
+    ]
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+network_hierarchy = NetworkHierarchy()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Dict, List
+
+import numpy as np
+
+from anomaly import anomaly_scores, anomaly_scorer
+from correlation import invalidate as invalidate_correlations
+from hierarchy import network_hierarchy
+from intent_parser import register_vocabulary
+from kpi_engine import invalidate_series, kpi_store
+from metrics import stage
+from offenders import offender_index
+from rca_engine import perform_batch_rca_analysis, rca_engine, severity_index
+from streaming import broker
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SAMPLE_FIELDS = ["kpi", "geo", "site_id", "timestamp", "value"]
+
+
+def parse_samples(samples: List[Dict[str, Any]]) -> "pd.DataFrame":
+    """Normalize raw samples; non-objects and rows missing kpi/geo/timestamp/value are dropped."""
+    import pandas as pd
+
+    df = pd.DataFrame.from_records([s for s in samples if isinstance(s, dict)], columns=SAMPLE_FIELDS)
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    df["date"] = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601", utc=True).dt.tz_localize(None)
+    df = df.dropna(subset=["kpi", "geo", "date", "value"])
+    df["site_id"] = df["site_id"].fillna("").astype(str)
+    df["kpi"] = df["kpi"].astype(str)
+    df["geo"] = df["geo"].astype(str)
+    return df[["kpi", "geo", "site_id", "date", "value"]].reset_index(drop=True)
+
+
+def ingest_samples(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Append KPI samples and push the resulting changes to subscribers.
+
+    Only what changed is published: one event per touched daily aggregate
+    and one per site whose RCA severity moved. The broker coalesces these
+    per subscriber.
+    """
+    with stage("ingest_parse"):
+        df = parse_samples(samples)
+    if df.empty:
+        return {"accepted": 0, "rejected": len(samples), "series_updated": 0, "severity_changes": 0}
+
+    with stage("ingest_append"):
+        touched = kpi_store.append(df)
+        invalidate_series(touched)
+        invalidate_correlations(df)
+        register_vocabulary(kpis=df["kpi"].unique(), markets=df["geo"].unique(), sites=df["site_id"].unique())
+
+    with stage("anomaly_score"):
+        anomaly_scorer.update_frame(df)
+    _rank_offenders(df)
+    with stage("hierarchy"):
+        network_hierarchy.update_frame(df)
+
+    _publish_aggregates(touched)
+    with stage("rca"):
+        severity_changes = _update_severities(df)
+
+    return {
+        "accepted": len(df),
+        "rejected": len(samples) - len(df),
+        "series_updated": len(touched),
+        "severity_changes": severity_changes,
+    }
+
+
+def _publish_aggregates(touched: Dict[tuple, np.ndarray]) -> None:
+    for (kpi, geo), days in touched.items():
+        ids, counts, sums = kpi_store.rollups.buckets(kpi, geo, resolution="day", start=int(days[0]), end=int(days[-1]) + 1)
+        for day, count, total in zip(ids.tolist(), counts.tolist(), sums.tolist()):
+            date = str(np.datetime64(day, "D"))
+            broker.publish(("aggregate", kpi, geo, day), {
+                "type": "aggregate",
+                "kpi": kpi,
+                "geo": geo,
+                "date": date,
+                "mean": round(total / count, 2),
+                "count": int(count),
+            })
+
+
+def _rank_offenders(df: "pd.DataFrame") -> None:
+    latest = df[df["site_id"] != ""].sort_values("date", kind="stable")
+    latest = latest.drop_duplicates(["kpi", "geo", "site_id"], keep="last")
+    offender_index.update_many(zip(
+        latest["kpi"], latest["geo"], latest["site_id"], latest["value"],
+        latest["date"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+    ))
+
+
+def _update_severities(df: "pd.DataFrame") -> int:
+    """Re-run RCA on the latest sample per (site, KPI) for KPIs with rules.
+
+    Returns the number of sites whose worst-KPI severity changed; one event
+    is published per such site.
+
+    Each site carries its deviation from its own baseline, so RCA can raise
+    the severity of a cell that is far off its normal level even while it
+    is inside the fixed thresholds.
+    """
+    latest = df[(df["site_id"] != "") & df["kpi"].isin(list(rca_engine.rca_rules))]
+    if latest.empty:
+        return 0
+    latest = latest.sort_values("date", kind="stable").drop_duplicates(["site_id", "kpi"], keep="last")
+    zscores = anomaly_scorer.zscores(latest["kpi"].tolist(), latest["site_id"].tolist())
+    sites = [
+        {"id": site_id, "kpi": kpi, "value": value, "market": geo, "baseline_zscore": None if np.isnan(z) else float(z)}
+        for site_id, kpi, value, geo, z in zip(latest["site_id"], latest["kpi"], latest["value"], latest["geo"], zscores)
+    ]
+    # A site's severity is that of its worst KPI, under its canonical key.
+    keys = {site["id"]: severity_index.key(site["id"]) for site in sites}
+    previous = {key: severity_index.get(key) for key in keys.values()}
+    analyses = {(keys[a["site"]["id"]], a["site"]["kpi"]): a for a in perform_batch_rca_analysis(sites)}
+
+    changes = 0
+    for key, before in previous.items():
+        after = severity_index.get(key)
+        if after is None or (before is not None and before.severity == after.severity):
+            continue
+        changes += 1
+        analysis = analyses.get((key, after.kpi))
+        site = analysis["site"] if analysis is not None else {}
+        zscore = site.get("baseline_zscore")
+        broker.publish(("severity", key), {
+            "type": "severity",
+            "site_id": key,
+            "kpi": after.kpi,
+            "geo": after.market,
+            "value": site.get("value"),
+            "severity": after.severity,
+            "anomaly_score": float(anomaly_scores(np.array([zscore], dtype=np.float64))[0]) if zscore is not None else 0.0,
+            "previous_severity": before.severity if before is not None else None,
+        })
+    return changes
@@ -1,37 +1,235 @@
-from typing import Dict
+import json
+import re
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-MARKETS = ["Dallas", "Oklahoma", "Chicago"]
+VOCAB_PATH = Path(__file__).with_name("intent_vocab.json")
 
+MARKETS = ["Dallas", "Oklahoma City", "Chicago"]
+DEFAULT_KPI = "CQI"
+DEFAULT_TIME = "last 7 days"
 
-def extract_intent(prompt: str) -> Dict[str, str]:
-    """Very naive rule-based intent parser."""
+TIME_PATTERN = re.compile(
+    r"\b(?:(?P<rel>today|yesterday|this week|last week)"
+    r"|(?:last|past)\s+(?P<n>\d+)\s+(?P<unit>hour|day|week)s?"
+    r"|(?P<start>\d{4}-\d{2}-\d{2})(?:\s*(?:to|until|through|-|\.\.)\s*(?P<end>\d{4}-\d{2}-\d{2}))?)\b"
+)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every vocabulary
+    phrase, independent of how many phrases are registered."""
+
+    def __init__(self, patterns: Dict[str, Tuple[str, str]]):
+        # patterns: lowercase phrase -> (category, canonical value)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str, str]]] = [[]]
+        for phrase, (category, value) in patterns.items():
+            node = 0
+            for ch in phrase:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(phrase), category, value))
+
+        # Breadth-first failure links; depth-1 nodes fail back to the root.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """Whole-word matches as (start, end, category, value), longest-first
+        and non-overlapping, in text order."""
+        return _select(self.hits(text), len(text))
+
+    def hits(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """Every whole-word match, overlapping ones included."""
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, category, value in self._out[node]:
+                start, end = i + 1 - length, i + 1
+                if _boundary(text, start - 1) and _boundary(text, end):
+                    hits.append((start, end, category, value))
+        return hits
+
+
+def _select(hits: List[Tuple[int, int, str, str]], length: int) -> List[Tuple[int, int, str, str]]:
+    """Keep the longest non-overlapping hits, in text order."""
+    taken = [False] * length
+    matches = []
+    for start, end, category, value in sorted(hits, key=lambda h: (h[0] - h[1], h[0])):
+        if not any(taken[start:end]):
+            taken[start:end] = [True] * (end - start)
+            matches.append((start, end, category, value))
+    return sorted(matches)
+
+
+def _boundary(text: str, index: int) -> bool:
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+def _load_vocab(path: Path = VOCAB_PATH) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+class IntentMatcher:
+    """KPI/market/site vocabulary compiled into automata.
+
+    Phrases added after the last build go into a small delta automaton that
+    is matched alongside the main one, so registering a new site id does not
+    throw the main automaton away. Once the delta holds ``DELTA_LIMIT``
+    phrases, the thread that added them rebuilds the main automaton from a
+    copy of the vocabulary and swaps it in. Readers always see a complete
+    pair of automata.
+    """
+
+    DELTA_LIMIT = 2048
+
+    def __init__(self, vocab_path: Path = VOCAB_PATH):
+        vocab = _load_vocab(vocab_path)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._patterns: Dict[str, Tuple[str, str]] = {}
+        self._delta: Dict[str, Tuple[str, str]] = {}
+        self._version = 0
+        self._automaton: Optional[AhoCorasick] = None
+        self._delta_automaton: Optional[AhoCorasick] = None
+        for category in ("kpis", "markets"):
+            self.add_many(category[:-1], vocab.get(category, {}).items())
+
+    def add(self, category: str, canonical: str, aliases: Iterable[str] = ()) -> None:
+        """Register a phrase; aliases already claimed keep their meaning."""
+        self.add_many(category, [(canonical, aliases)])
+
+    def add_many(self, category: str, entries: Iterable[Tuple[str, Iterable[str]]]) -> None:
+        """Register (canonical, aliases) pairs of one category in one update."""
+        new = [
+            (phrase, (category, canonical))
+            for canonical, aliases in entries
+            for phrase in (canonical.lower(), re.sub(r"\s*\(.*?\)", "", canonical).lower(), *(a.lower() for a in aliases))
+            if phrase
+        ]
+        with self._lock:
+            added = False
+            for phrase, meaning in new:
+                if phrase not in self._patterns:
+                    self._patterns[phrase] = self._delta[phrase] = meaning
+                    added = True
+            if not added:
+                return
+            self._version += 1
+            self._delta_automaton = None
+            fold = len(self._delta) >= self.DELTA_LIMIT
+        if fold:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Compile the whole vocabulary into the main automaton and empty the delta."""
+        with self._build_lock:
+            with self._lock:
+                patterns = dict(self._patterns)
+            automaton = AhoCorasick(patterns)
+            with self._lock:
+                self._automaton = automaton
+                self._delta = {phrase: meaning for phrase, meaning in self._delta.items() if phrase not in patterns}
+                self._version += 1
+                self._delta_automaton = None
+
+    def _current(self) -> Tuple[AhoCorasick, AhoCorasick]:
+        if self._automaton is None:
+            self._rebuild()
+        with self._lock:
+            automaton, delta_automaton = self._automaton, self._delta_automaton
+            if delta_automaton is not None:
+                return automaton, delta_automaton
+            version, delta = self._version, dict(self._delta)
+        delta_automaton = AhoCorasick(delta)
+        with self._lock:
+            if self._version == version:
+                self._delta_automaton = delta_automaton
+        return automaton, delta_automaton
+
+    def match(self, text: str) -> List[Tuple[int, int, str, str]]:
+        automaton, delta_automaton = self._current()
+        return _select(automaton.hits(text) + delta_automaton.hits(text), len(text))
+
+
+_matcher = IntentMatcher()
+# KPIs without RCA rules whose low values are the degraded state; KPIs with
+# rules take the direction from their ``reverse_logic``.
+LOWER_IS_WORSE = frozenset(_load_vocab().get("lower_is_worse", []))
+
+
+def register_vocabulary(kpis: Iterable[str] = (), markets: Iterable[str] = (), sites: Iterable[str] = ()) -> None:
+    """Extend the matcher with names found in the loaded data."""
+    _matcher.add_many("kpi", ((kpi, ()) for kpi in kpis))
+    _matcher.add_many("market", ((market, ()) for market in markets))
+    _matcher.add_many("site", ((str(site), ()) for site in sites))
+
+
+def _extract_time(text: str) -> str:
+    match = TIME_PATTERN.search(text)
+    if not match:
+        return DEFAULT_TIME
+    if match.group("rel"):
+        return DEFAULT_TIME if match.group("rel") == "last week" else match.group("rel")
+    if match.group("n"):
+        n, unit = int(match.group("n")), match.group("unit")
+        return f"last {n} hours" if unit == "hour" else f"last {n * 7 if unit == 'week' else n} days"
+    if match.group("end"):
+        return f"{match.group('start')} to {match.group('end')}"
+    return match.group("start")
+
+
+def extract_intent(prompt: str) -> Dict[str, Any]:
+    """Rule-based intent parser backed by a compiled vocabulary matcher.
+
+    ``kpi``/``geo`` are the first KPI and market mentioned; ``targets`` is
+    every mentioned KPI crossed with every mentioned market, in prompt
+    order, so "compare latency in Dallas and Chicago" yields two targets.
+    ``defaults`` lists the fields that were not recognised in the prompt
+    and fell back to a default value.
+    """
     text = prompt.lower()
-    # KPI detection
-    if "latency" in text:
-        kpi = "Latency"
-    elif "cqi" in text:
-        kpi = "CQI"
-    elif "throughput" in text:
-        kpi = "Throughput"
-    else:
-        kpi = "CQI"
-
-    geo = None
-    for loc in MARKETS:
-        if loc.lower() in text:
-            geo = loc
-            break
-    if not geo:
-        geo = MARKETS[0]
-
-    # time detection
-    if "today" in text:
-        time = "today"
-    elif "yesterday" in text:
-        time = "yesterday"
-    elif "this week" in text:
-        time = "this week"
-    else:
-        time = "last 7 days"
-
-    return {"kpi": kpi, "geo": geo, "time": time}
+    found: Dict[str, List[str]] = {}
+    for _, _, category, value in _matcher.match(text):
+        values = found.setdefault(category, [])
+        if value not in values:
+            values.append(value)
+
+    defaults = [field for field in ("kpi", "market") if field not in found]
+    kpis = found.get("kpi", [DEFAULT_KPI])
+    geos = found.get("market", [MARKETS[0]])
+    return {
+        "kpi": kpis[0],
+        "geo": geos[0],
+        "time": _extract_time(text),
+        "site": found.get("site", [None])[0],
+        "targets": [{"kpi": kpi, "geo": geo} for kpi in kpis for geo in geos],
+        "defaults": defaults,
+    }
+
+
+def extract_intents(prompts: Iterable[str]) -> List[Dict[str, Any]]:
+    """Batch form of extract_intent, e.g. for replaying chat logs."""
+    return [extract_intent(prompt) for prompt in prompts]
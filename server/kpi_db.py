@@ -0,0 +1,88 @@
+from __future__ import annotations
+import csv
+import os
+import sqlite3
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kpi_data (
+    kpi TEXT NOT NULL,
+    geo TEXT NOT NULL,
+    date TEXT NOT NULL,
+    site_id TEXT,
+    value REAL NOT NULL
+);
+"""
+
+COLUMNS = ("kpi", "geo", "date", "site_id", "value")
+
+
+class KPIDatabase:
+    """Managed ``kpi.db``: schema and bulk loading.
+
+    KPIStore reads the whole table once per load and answers every query
+    from memory, so the table has no secondary index and no pooled
+    connections.
+    """
+
+    def __init__(self, db_path: Path, chunk_size: int = 50_000):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+
+    def exists(self) -> bool:
+        return self.db_path.exists()
+
+    def build_from_csv(self, csv_path: Path) -> int:
+        """Rebuild the database from a CSV.
+
+        Rows are inserted with ``executemany`` in one transaction into a
+        temporary file, then swapped in atomically so readers never see a
+        partial table.
+        """
+        tmp_path = self.db_path.with_name(self.db_path.name + ".tmp")
+        if tmp_path.exists():
+            tmp_path.unlink()
+        conn = sqlite3.connect(tmp_path)
+        rows = 0
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            with conn:
+                conn.executescript(SCHEMA)
+                with open(csv_path, newline="") as f:
+                    reader = csv.DictReader(f)
+                    records = (tuple(r.get(c) for c in COLUMNS) for r in reader)
+                    while True:
+                        chunk = list(islice(records, self.chunk_size))
+                        if not chunk:
+                            break
+                        conn.executemany("INSERT INTO kpi_data VALUES (?, ?, ?, ?, ?)", chunk)
+                        rows += len(chunk)
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.db_path)
+        return rows
+
+    def read_all(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        # A fresh connection per load also sees a file swapped in by build_from_csv.
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            return pd.read_sql_query("SELECT * FROM kpi_data", conn)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # python kpi_db.py [kpi.csv] -- builds kpi.db next to this file
+    from kpi_engine import DATA_CSV, DB_PATH
+
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_CSV
+    print(f"{DB_PATH}: {KPIDatabase(DB_PATH).build_from_csv(source)} rows loaded from {source}")
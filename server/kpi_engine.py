@@ -1,59 +1,185 @@
 from __future__ import annotations
-import sqlite3
-from functools import lru_cache
+import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
 
-import pandas as pd
+import numpy as np
+
+from encoding import Series
+from kpi_db import KPIDatabase
+from kpi_store import KPIStore
+from metrics import stage
+from result_cache import TTLCache
+from rollups import RESOLUTIONS
+from time_window import resolve_window
 
 DATA_CSV = Path(__file__).with_name("sample_kpi.csv")
 DB_PATH = Path(__file__).with_name("kpi.db")
+# Built by ``python snapshot.py``; used at startup while it matches the source.
+SNAPSHOT_PATH = Path(os.environ.get("KPI_SNAPSHOT", Path(__file__).with_name("kpi.snapshot")))
 
+# Resident dataset shared by all requests; reloaded when the source changes.
+kpi_database = KPIDatabase(DB_PATH)
+kpi_store = KPIStore(DATA_CSV, kpi_database, snapshot_path=SNAPSHOT_PATH)
 
-def _load_data(kpi: str, geo: str) -> pd.DataFrame:
-    if DB_PATH.exists():
-        conn = sqlite3.connect(DB_PATH)
-        query = "SELECT date, value FROM kpi_data WHERE kpi=? AND geo=? ORDER BY date"
-        df = pd.read_sql_query(query, conn, params=(kpi, geo))
-        conn.close()
-        return df
-    elif DATA_CSV.exists():
-        df = pd.read_csv(DATA_CSV)
-        df = df[(df["kpi"] == kpi) & (df["geo"] == geo)]
-        return df
-    else:
-        return pd.DataFrame(columns=["date", "value"])
+# Responses keyed on the normalized intent; dropped whenever the store reloads.
+result_cache = TTLCache(
+    maxsize=int(os.environ.get("KPI_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("KPI_CACHE_TTL", 300)),
+)
+kpi_store.add_listener(result_cache.clear)
 
+# Multi-target prompts (several markets or KPIs) are answered per target and
+# merged. Each target is a few rollup lookups (tens of microseconds), cached
+# on its own, so targets run inline: a thread pool measured slower under the
+# GIL and a process pool would need its own copy of the store.
+MAX_TARGETS = 12
 
-@lru_cache(maxsize=128)
-def get_kpi_data(intent: Dict[str, str]) -> Dict[str, Any]:
-    kpi = intent.get("kpi", "CQI")
-    geo = intent.get("geo", "Dallas")
-    time = intent.get("time", "last 7 days")
+Target = Tuple[str, str]  # (kpi, geo)
 
-    df = _load_data(kpi, geo)
 
-    if df.empty:
-        labels = []
-        values = []
-    else:
-        daily = df.groupby("date")["value"].mean().reset_index()
-        labels = daily["date"].tolist()
-        values = daily["value"].round(2).tolist()
+class KPIResult(NamedTuple):
+    """A prompt answer plus the chart series as arrays for binary encodings."""
+    response: Dict[str, Any]
+    series: List[Series]
+
+    def meta(self) -> Dict[str, Any]:
+        """The response without the chart labels and data carried by ``series``."""
+        charts = []
+        for chart in self.response["charts"]:
+            chart = {k: v for k, v in chart.items() if k not in ("labels", "data")}
+            if "datasets" in chart:
+                chart["datasets"] = [{"label": dataset["label"]} for dataset in chart["datasets"]]
+            charts.append(chart)
+        return {**self.response, "charts": charts}
+
+
+def _normalize_intent(intent: Dict[str, Any]) -> Tuple[Tuple[Target, ...], str, Optional[str]]:
+    targets = [(t.get("kpi") or "CQI", t.get("geo") or "Dallas") for t in intent.get("targets") or ()]
+    if not targets:
+        targets = [(intent.get("kpi") or "CQI", intent.get("geo") or "Dallas")]
+    return (
+        tuple(dict.fromkeys(targets))[:MAX_TARGETS],
+        (intent.get("time") or "last 7 days").strip().lower(),
+        intent.get("site") or None,
+    )
+
+
+def get_kpi_data(intent: Dict[str, Any]) -> Dict[str, Any]:
+    return get_kpi_result(intent).response
+
+
+def get_kpi_result(intent: Dict[str, Any]) -> KPIResult:
+    targets, time, site = _normalize_intent(intent)
+    # Checking for a reload first lets a changed source clear stale entries.
+    kpi_store.maybe_reload()
+    if len(targets) == 1:
+        return _cached_result(targets[0], time, site)
+    key = (targets, time, site)
+    result = result_cache.get(key)
+    if result is None:
+        with stage("fanout"):
+            parts = [_cached_result(target, time, site) for target in targets]
+        result = _merge_results(targets, parts)
+        result_cache.set(key, result)
+    return result
+
+
+def _cached_result(target: Target, time: str, site: Optional[str] = None) -> KPIResult:
+    key = ((target,), time, site)
+    result = result_cache.get(key)
+    if result is None:
+        result = _build_kpi_response(target[0], target[1], time, site)
+        result_cache.set(key, result)
+    return result
+
+
+def invalidate_series(touched: Iterable[Target]) -> int:
+    """Drop cached answers that include any of the given (kpi, geo) series."""
+    touched = set(touched)
+    return result_cache.discard_where(lambda key: any(target in touched for target in key[0]))
+
+
+def _merge_results(targets: Tuple[Target, ...], parts: List[KPIResult]) -> KPIResult:
+    """Combine single-target answers into one multi-series chart per KPI."""
+    by_kpi: Dict[str, List[int]] = {}
+    for i, (kpi, _) in enumerate(targets):
+        by_kpi.setdefault(kpi, []).append(i)
+
+    charts = []
+    for kpi, members in by_kpi.items():
+        series = [parts[i].series[0] for i in members]
+        unit = series[0].unit
+        stamps = np.unique(np.concatenate([s.timestamps for s in series]))
+        datasets = []
+        for i, s in zip(members, series):
+            data: List[Optional[float]] = [None] * len(stamps)
+            for position, value in zip(np.searchsorted(stamps, s.timestamps).tolist(), s.values.tolist()):
+                data[position] = value
+            datasets.append({"label": targets[i][1], "data": data})
+        charts.append({
+            "type": "line",
+            "title": f"{kpi}: {' vs '.join(targets[i][1] for i in members)}",
+            "labels": _bucket_labels(stamps // unit, _resolution_name(unit)),
+            "datasets": datasets,
+            # Single-series fields for clients that only draw one line.
+            "data": datasets[0]["data"],
+            "datasetLabel": kpi,
+        })
+
+    actions = list(dict.fromkeys(action for part in parts for action in part.response["actions"]))
+    response = {
+        "reply": " ".join(part.response["reply"] for part in parts),
+        "charts": charts,
+        "actions": actions,
+    }
+    series = [s._replace(name=f"{kpi} / {geo}") for (kpi, geo), part in zip(targets, parts) for s in part.series]
+    return KPIResult(response, series)
+
+
+def _resolution_name(width: int) -> str:
+    return next(name for name, seconds in RESOLUTIONS.items() if seconds == width)
+
+
+def _bucket(moment: Optional[np.datetime64], width: int) -> Optional[int]:
+    return None if moment is None else int(moment.astype(np.int64)) // width
+
+
+def _bucket_labels(buckets: np.ndarray, resolution: str) -> list:
+    moments = (buckets * RESOLUTIONS[resolution]).astype("datetime64[s]")
+    if resolution == "day":
+        return np.datetime_as_string(moments, unit="D").tolist()
+    return [label.replace("T", " ") for label in np.datetime_as_string(moments, unit="m").tolist()]
+
+
+def _build_kpi_response(kpi: str, geo: str, time: str, site: Optional[str] = None) -> KPIResult:
+    # Relative windows are anchored on the latest sample in the dataset.
+    start, end, resolution = resolve_window(time, kpi_store.latest)
+    width = RESOLUTIONS[resolution]
+    # A site mentioned in the prompt narrows the answer to that site's rollup.
+    place = geo if site is None else f"{geo} site {site}"
+    with stage("data_load"):
+        buckets, counts, sums = kpi_store.rollups.buckets(
+            kpi, geo, site=site, resolution=resolution, start=_bucket(start, width), end=_bucket(end, width)
+        )
+    with stage("aggregate"):
+        labels = _bucket_labels(buckets, resolution)
+        means = (sums / counts).round(2)
+        values = means.tolist()
+        avg = sums.sum() / counts.sum() if len(buckets) else None
 
     chart = {
         "type": "line",
-        "title": f"{kpi} trend in {geo}",
+        "title": f"{kpi} trend in {place}",
         "labels": labels,
         "data": values,
         "datasetLabel": kpi,
     }
 
     if values:
-        avg = df["value"].mean()
-        reply = f"{kpi} in {geo} averages {avg:.1f} over {time}."
+        reply = f"{kpi} in {place} averages {avg:.1f} over {time}."
     else:
-        reply = f"No {kpi} data available for {geo}."
+        reply = f"No {kpi} data available for {place}."
 
     actions = [
         f"Investigate sites with high {kpi}",
@@ -61,4 +187,5 @@ def get_kpi_data(intent: Dict[str, str]) -> Dict[str, Any]:
         f"Add {kpi} threshold alert",
     ]
 
-    return {"reply": reply, "charts": [chart], "actions": actions}
+    response = {"reply": reply, "charts": [chart], "actions": actions}
+    return KPIResult(response, [Series(kpi, buckets * width, means, width)])
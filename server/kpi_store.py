@@ -0,0 +1,230 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from kpi_db import KPIDatabase
+from rollups import RESOLUTIONS, RollupIndex
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from snapshot import Snapshot
+
+
+class KPISeries:
+    """Columnar samples for one (kpi, geo) pair, sorted by date."""
+
+    __slots__ = ("kpi", "geo", "dates", "values", "sites")
+
+    def __init__(self, kpi: str, geo: str, dates: np.ndarray, values: np.ndarray, sites: np.ndarray):
+        self.kpi = kpi
+        self.geo = geo
+        self.dates = dates  # datetime64[s], ascending
+        self.values = values  # float64
+        self.sites = sites  # int32 codes into KPIStore.site_ids
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+class KPIStore:
+    """Resident KPI dataset loaded once and reloaded when the source changes.
+
+    Rows are grouped by (kpi, geo) into ``KPISeries`` with pre-sorted date
+    arrays; site ids are categorical-encoded into ``site_ids``. Hourly and
+    daily rollups are built alongside in ``rollups``. When ``snapshot_path``
+    holds a snapshot of the current source (see ``snapshot.py``), it is
+    memory-mapped instead of parsed.
+    """
+
+    def __init__(
+        self,
+        csv_path: Path,
+        database: KPIDatabase,
+        check_interval: float = 2.0,
+        snapshot_path: Optional[Path] = None,
+    ):
+        self.csv_path = csv_path
+        self.database = database
+        self.snapshot_path = snapshot_path
+        self.check_interval = check_interval
+        self.series: Dict[Tuple[str, str], KPISeries] = {}
+        self.site_ids = np.empty(0, dtype=object)
+        self.rollups = RollupIndex()
+        self.latest: Optional[np.datetime64] = None
+        self.version = 0
+        self._site_codes: Dict[str, int] = {}
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback invoked after every (re)load."""
+        self._listeners.append(callback)
+
+    def _source(self) -> Optional[Path]:
+        if self.database.exists():
+            return self.database.db_path
+        if self.csv_path.exists():
+            return self.csv_path
+        return None
+
+    def _source_signature(self):
+        source = self._source()
+        if source is None:
+            return None
+        stat = os.stat(source)
+        return (str(source), stat.st_mtime_ns, stat.st_size)
+
+    def _read_source(self, source: Optional[Path]) -> "pd.DataFrame":
+        import pandas as pd
+
+        if source is None:
+            return pd.DataFrame(columns=["kpi", "geo", "date", "site_id", "value"])
+        if source == self.database.db_path:
+            return self.database.read_all()
+        return pd.read_csv(source)
+
+    def load(self, use_snapshot: bool = True) -> None:
+        """(Re)build the in-memory series from the current source."""
+        signature = self._source_signature()
+        snapshot = self._matching_snapshot(signature) if use_snapshot else None
+        if snapshot is not None:
+            self._install(lambda: self._build_from_snapshot(snapshot), signature)
+        else:
+            df = self._read_source(Path(signature[0]) if signature else None)
+            self._install(lambda: self._build(df), signature)
+
+    def load_frame(self, df: "pd.DataFrame") -> None:
+        """Replace the dataset with an in-memory frame (tests, benchmarks)."""
+        self._install(lambda: self._build(df), self._source_signature())
+
+    def _matching_snapshot(self, signature) -> Optional["Snapshot"]:
+        """The snapshot at ``snapshot_path`` if it was built from this exact source."""
+        if self.snapshot_path is None or not Path(self.snapshot_path).exists():
+            return None
+        from snapshot import Snapshot
+
+        try:
+            snapshot = Snapshot(self.snapshot_path)
+        except ValueError:
+            return None
+        return snapshot if signature is not None and snapshot.signature == tuple(signature) else None
+
+    def _install(self, build: Callable[[], None], signature) -> None:
+        with self._lock:
+            build()
+            self._signature = signature
+            self._last_check = time.monotonic()
+            self.version += 1
+        for callback in self._listeners:
+            callback()
+
+    def _build(self, df: "pd.DataFrame") -> None:
+        import pandas as pd
+
+        if "site_id" not in df.columns:
+            df = df.assign(site_id="")
+        dates = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[s]")
+        sites = pd.Categorical(df["site_id"].astype(str))
+        values = df["value"].to_numpy(dtype=np.float64)
+        codes = sites.codes.astype(np.int32)
+
+        site_ids = np.asarray(sites.categories, dtype=object)
+
+        series: Dict[Tuple[str, str], KPISeries] = {}
+        rollups = RollupIndex()
+        for (kpi, geo), idx in df.groupby(["kpi", "geo"], sort=False).indices.items():
+            idx = idx[np.argsort(dates[idx], kind="stable")]
+            series[(kpi, geo)] = KPISeries(kpi, geo, dates[idx], values[idx], codes[idx])
+            rollups.add(kpi, geo, codes[idx], dates[idx].astype(np.int64), values[idx], site_names=site_ids)
+
+        self.series = series
+        self.site_ids = site_ids
+        self._site_codes = {site: code for code, site in enumerate(site_ids)}
+        self.rollups = rollups
+        self.latest = dates.max() if len(dates) else None
+
+    def _build_from_snapshot(self, snapshot: "Snapshot") -> None:
+        header, arrays = snapshot.header, snapshot.arrays
+        bounds = arrays["series_offsets"]
+        dates = arrays["dates"].view("datetime64[s]")
+        series_keys = [tuple(key) for key in header["series"]]
+        self.series = {
+            (kpi, geo): KPISeries(
+                kpi, geo, dates[bounds[i]:bounds[i + 1]], arrays["values"][bounds[i]:bounds[i + 1]],
+                arrays["sites"][bounds[i]:bounds[i + 1]],
+            )
+            for i, (kpi, geo) in enumerate(series_keys)
+        }
+        self.site_ids = np.array(header["site_ids"], dtype=object)
+        self._site_codes = {site: code for code, site in enumerate(header["site_ids"])}
+        packed = {
+            resolution: {name: arrays[f"rollup_{resolution}_{name}"]
+                         for name in ("key_series", "key_site", "offsets", "ids", "counts", "sums")}
+            for resolution in RESOLUTIONS
+        }
+        series_codes = {key: code for code, key in enumerate(series_keys)}
+        self.rollups = RollupIndex.from_packed(packed, series_codes, self._site_codes)
+        self.latest = None if header["latest"] is None else np.datetime64(header["latest"], "s")
+
+    def append(self, df: "pd.DataFrame") -> Dict[Tuple[str, str], np.ndarray]:
+        """Append samples (kpi, geo, site_id, date as datetime64[s], value).
+
+        Series are replaced copy-on-write and rollups updated incrementally;
+        returns the epoch-day buckets touched per (kpi, geo). Samples are
+        held in memory only, so a reload from the source file drops them.
+        """
+        import pandas as pd
+
+        touched: Dict[Tuple[str, str], np.ndarray] = {}
+        with self._lock:
+            new_sites = [s for s in pd.unique(df["site_id"]) if s not in self._site_codes]
+            if new_sites:
+                self._site_codes.update({s: len(self.site_ids) + i for i, s in enumerate(new_sites)})
+                self.site_ids = np.concatenate([self.site_ids, np.asarray(new_sites, dtype=object)])
+            codes = df["site_id"].map(self._site_codes).to_numpy(dtype=np.int32)
+            dates = df["date"].to_numpy(dtype="datetime64[s]")
+            values = df["value"].to_numpy(dtype=np.float64)
+
+            series = dict(self.series)
+            for (kpi, geo), idx in df.groupby(["kpi", "geo"], sort=False).indices.items():
+                idx = idx[np.argsort(dates[idx], kind="stable")]
+                old = series.get((kpi, geo))
+                if old is None:
+                    merged = (dates[idx], values[idx], codes[idx])
+                else:
+                    merged = tuple(np.concatenate(pair) for pair in (
+                        (old.dates, dates[idx]), (old.values, values[idx]), (old.sites, codes[idx])))
+                    if len(old.dates) and dates[idx[0]] < old.dates[-1]:
+                        order = np.argsort(merged[0], kind="stable")
+                        merged = tuple(column[order] for column in merged)
+                series[(kpi, geo)] = KPISeries(kpi, geo, *merged)
+                seconds = dates[idx].astype(np.int64)
+                self.rollups.add(kpi, geo, codes[idx], seconds, values[idx], site_names=self.site_ids)
+                touched[(kpi, geo)] = np.unique(seconds // 86400)
+
+            self.series = series
+            if len(dates):
+                newest = dates.max()
+                self.latest = newest if self.latest is None else max(self.latest, newest)
+        return touched
+
+    def maybe_reload(self) -> bool:
+        """Reload if the source file changed; stat calls are throttled."""
+        now = time.monotonic()
+        if self.version and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        if self.version and self._source_signature() == self._signature:
+            return False
+        self.load()
+        return True
+
+    def get(self, kpi: str, geo: str) -> Optional[KPISeries]:
+        self.maybe_reload()
+        return self.series.get((kpi, geo))
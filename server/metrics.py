@@ -0,0 +1,230 @@
+"""Request and stage latency histograms exposed in Prometheus text format.
+
+``init_app`` times every request by route; ``stage`` times named steps
+(intent parse, data load, aggregation, RCA, JSON serialization) inside a
+request. Set ``PROFILE_SLOWEST=N`` to keep the N slowest requests with their
+stage breakdown, plus a cProfile report for a sampled fraction
+(``PROFILE_SAMPLE_RATE``, default 0.1) of requests.
+"""
+
+import bisect
+import contextvars
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, g, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a lock-protected counts array."""
+
+    __slots__ = ("counts", "total", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+        self._histograms.setdefault(name, {})
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        series = self._histograms[name]
+        hist = series.get(labels)
+        if hist is None:
+            with self._lock:
+                hist = series.setdefault(labels, Histogram())
+        hist.observe(value)
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """Register a callable returning extra exposition lines (counters, gauges)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for name, series in self._histograms.items():
+            lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in list(series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in labels)
+                prefix = base + "," if base else ""
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, "+Inf"), hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{base}}} {hist.total:.6f}")
+                lines.append(f"{name}_count{{{base}}} {hist.count}")
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.histogram("awsp_request_duration_seconds", "Request latency by route.")
+registry.histogram("awsp_stage_duration_seconds", "Latency of processing stages within requests.")
+
+_request_stages: contextvars.ContextVar = contextvars.ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a named processing stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("awsp_stage_duration_seconds", (("stage", name),), elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+class SlowRequestLog:
+    """Keeps the N slowest requests; a sampled subset carries a cProfile report.
+
+    Only one profiler runs per process: from Python 3.12 cProfile is built on
+    ``sys.monitoring``, which refuses a second active profiler. A sampled
+    request that finds one running is simply not profiled.
+    """
+
+    def __init__(self, size: int, sample_rate: float):
+        self.size = size
+        self.sample_rate = sample_rate
+        self._heap: List[Tuple[float, int, Dict]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+
+    def start_profile(self) -> Optional[cProfile.Profile]:
+        """A running profiler for a sampled request, or None."""
+        if random.random() >= self.sample_rate or not self._profiling.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another tool holds the profiling hook
+            self._profiling.release()
+            return None
+        return profiler
+
+    def stop_profile(self, profiler: cProfile.Profile) -> None:
+        profiler.disable()
+        self._profiling.release()
+
+    def record(self, duration: float, entry: Dict, profiler: Optional[cProfile.Profile]) -> None:
+        if len(self._heap) >= self.size and duration <= self._heap[0][0]:
+            return
+        if profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+            entry["profile"] = out.getvalue()
+        with self._lock:
+            self._seq += 1
+            item = (duration, self._seq, entry)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+
+    def slowest(self) -> List[Dict]:
+        return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default provider with serialization timed as its own stage."""
+
+    def dumps(self, obj, **kwargs):
+        with stage("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+def init_app(app: Flask) -> None:
+    """Install request timing, the /metrics endpoint and the optional slow-request log."""
+    slowest = int(os.environ.get("PROFILE_SLOWEST", 0))
+    slow_log = SlowRequestLog(slowest, float(os.environ.get("PROFILE_SAMPLE_RATE", 0.1))) if slowest else None
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        # A fresh dict per request, even if the last one on this thread never
+        # reached teardown
+        _request_stages.set({})
+        g.metrics_profiler = slow_log.start_profile() if slow_log is not None else None
+
+    @app.after_request
+    def _record(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        duration = time.perf_counter() - start
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            slow_log.stop_profile(profiler)
+        stages = _request_stages.get() or {}
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        registry.observe(
+            "awsp_request_duration_seconds",
+            (("route", route), ("method", request.method), ("status", str(response.status_code))),
+            duration,
+        )
+        if slow_log is not None:
+            slow_log.record(duration, {
+                "route": route,
+                "path": request.full_path.rstrip("?"),
+                "method": request.method,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 3),
+                "stages_ms": {name: round(t * 1000, 3) for name, t in stages.items()},
+            }, profiler)
+        return response
+
+    @app.teardown_request
+    def _clear(exc):
+        # Runs even when after_request did not, e.g. on an unhandled error
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            slow_log.stop_profile(profiler)
+        _request_stages.set(None)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    @app.route("/metrics/slowest", methods=["GET"])
+    def slowest_requests():
+        if slow_log is None:
+            return jsonify({"error": "Set PROFILE_SLOWEST=N to record the slowest requests"}), 404
+        return jsonify({"requests": slow_log.slowest()})
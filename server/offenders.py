@@ -0,0 +1,182 @@
+from __future__ import annotations
+import heapq
+import itertools
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from intent_parser import LOWER_IS_WORSE
+from rca_engine import rca_engine
+
+
+def lower_is_worse(kpi: str) -> bool:
+    """Ranking direction: the RCA rules' ``reverse_logic``, else the KPI vocabulary."""
+    rules = rca_engine.rca_rules.get(kpi)
+    return rules.reverse_logic if rules is not None else kpi in LOWER_IS_WORSE
+
+
+class _OffenderHeap:
+    """Min-heap of (badness key, seq, site) with lazily deleted stale entries.
+
+    ``latest`` holds each site's current (value, updated_at, seq); a heap
+    entry whose seq no longer matches is stale and is dropped when popped.
+    ``updated_at`` strings ("YYYY-MM-DD HH:MM[:SS]") sort in time order; a
+    sample older than the site's current one is ignored.
+    """
+
+    __slots__ = ("sign", "heap", "latest")
+
+    def __init__(self, lower_worse: bool):
+        # Heap order is worst first: the lowest value, or the highest negated.
+        self.sign = 1.0 if lower_worse else -1.0
+        self.heap: List[Tuple[float, int, str]] = []
+        self.latest: Dict[str, Tuple[float, Optional[str], int]] = {}
+
+    def push(self, site: str, value: float, updated_at: Optional[str], seq: int) -> None:
+        current = self.latest.get(site)
+        if current is not None and updated_at is not None and current[1] is not None and updated_at < current[1]:
+            return
+        self.latest[site] = (value, updated_at, seq)
+        heapq.heappush(self.heap, (self.sign * value, seq, site))
+        if len(self.heap) > 2 * len(self.latest) + 64:
+            self.compact()
+
+    def compact(self) -> None:
+        self.heap = [(self.sign * value, seq, site) for site, (value, _, seq) in self.latest.items()]
+        heapq.heapify(self.heap)
+
+    def worst(self, n: int, lower_worse: bool) -> List[Tuple[float, int, str]]:
+        """Pop the ``n`` worst live entries, then push them back.
+
+        The direction is passed per query so a rules reload takes effect; a
+        change re-heapifies the live entries once.
+        """
+        sign = 1.0 if lower_worse else -1.0
+        if sign != self.sign:
+            self.sign = sign
+            self.compact()
+        found = []
+        while self.heap and len(found) < n:
+            entry = heapq.heappop(self.heap)
+            current = self.latest.get(entry[2])
+            if current is not None and current[2] == entry[1]:
+                found.append(entry)
+        for entry in found:
+            heapq.heappush(self.heap, entry)
+        return found
+
+
+class OffenderIndex:
+    """Worst sites per (KPI, market), ranked by each site's latest value.
+
+    Every sample is an O(log n) heap push; superseded values are left in the
+    heap and skipped when reached, with a compaction once they outnumber
+    live ones. Ranking direction follows ``lower_is_worse`` at query time.
+    """
+
+    def __init__(self):
+        self._heaps: Dict[Tuple[str, str], _OffenderHeap] = {}
+        self._names: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()
+
+    def update(self, kpi: str, market: str, site: Any, value: Any, updated_at: Optional[str] = None) -> None:
+        self.update_many([(kpi, market, site, value, updated_at)])
+
+    def update_many(self, records: Iterable[Tuple[str, str, Any, Any, Optional[str]]]) -> None:
+        """Apply (kpi, market, site, value, updated_at) samples; NaN values are skipped."""
+        self.catch_up()
+        self._apply(records)
+
+    def _apply(self, records: Iterable[Tuple[str, str, Any, Any, Optional[str]]]) -> None:
+        with self._lock:
+            for kpi, market, site, value, updated_at in records:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if math.isnan(value):
+                    continue
+                key = (str(kpi), str(market))
+                heap = self._heaps.get(key)
+                if heap is None:
+                    heap = self._heaps[key] = _OffenderHeap(lower_is_worse(key[0]))
+                    self._names[(key[0].lower(), key[1].lower())] = key
+                heap.push(str(site), value, updated_at, next(self._seq))
+
+    def rebuild(self, store, records: Iterable[Tuple[str, str, Any, Any, Optional[str]]] = (), defer: bool = False) -> None:
+        """Reset to the latest sample of every site in a KPIStore, then apply ``records``.
+
+        With ``defer`` the work waits for the first read or update, as in
+        ``AnomalyScorer.rebuild``.
+        """
+        self._pending = (store.series, store.site_ids, list(records))
+        if not defer:
+            self.catch_up()
+
+    def catch_up(self) -> None:
+        """Run a deferred ``rebuild`` now, if one is pending or in progress."""
+        if self._pending is None and not self._rebuilding:
+            return
+        with self._rebuild_lock:
+            if self._pending is None:
+                return
+            self._rebuilding = True
+            pending, self._pending = self._pending, None
+            try:
+                self._replay(pending)
+            finally:
+                self._rebuilding = False
+
+    def _replay(self, pending) -> None:
+        series_by_key, site_ids, records = pending
+        with self._lock:
+            self._heaps, self._names = {}, {}
+        for (kpi, geo), series in series_by_key.items():
+            if not len(series):
+                continue
+            # Series are date-sorted: the last occurrence of a site is its latest sample.
+            codes = series.sites[::-1]
+            _, first = np.unique(codes, return_index=True)
+            last = len(codes) - 1 - first
+            self._apply(
+                (kpi, geo, site, value, str(date).replace("T", " "))
+                for site, value, date in zip(site_ids[series.sites[last]], series.values[last], series.dates[last])
+                if site != ""
+            )
+        self._apply(records)
+
+    def top(self, kpi: str, market: Optional[str] = None, n: int = 10) -> List[Dict[str, Any]]:
+        """The ``n`` worst sites for a KPI in one market, or across all markets."""
+        self.catch_up()
+        kpi_name = kpi.lower()
+        with self._lock:
+            if market:
+                key = self._names.get((kpi_name, market.lower()))
+                keys = [key] if key else []
+            else:
+                keys = [key for lowered, key in self._names.items() if lowered[0] == kpi_name]
+            candidates = [
+                (entry, key) for key in keys for entry in self._heaps[key].worst(n, lower_is_worse(key[0]))
+            ]
+            candidates.sort(key=lambda item: item[0])
+            results = []
+            for rank, ((_, _, site), key) in enumerate(candidates[:n], start=1):
+                value, updated_at, _ = self._heaps[key].latest[site]
+                results.append({
+                    "rank": rank,
+                    "site_id": site,
+                    "kpi": key[0],
+                    "geo": key[1],
+                    "value": value,
+                    "updated_at": updated_at,
+                })
+        return results
+
+
+offender_index = OffenderIndex()
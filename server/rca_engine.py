@@ -3,126 +3,106 @@
 
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-import random
+import hashlib
+import os
+from pathlib import Path
+import time
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+
+from anomaly import deviation_severity
+from rca_rules import DEFAULT_RULES_PATH, KPIRule, RootCause, confidence_score, parse_rules
+from result_cache import TTLCache
+from severity_index import SEVERITY_RANK, SeverityIndex
+
+SEVERITY_NAMES = {rank: name for name, rank in SEVERITY_RANK.items()}
 
 class NetworkRCAEngine:
-    def __init__(self):
-        self.rca_rules = {
-            'RRC Setup Failure Rate': {
-                'thresholds': {'critical': 15, 'major': 8},
-                'root_causes': {
-                    'high': [
-                        {
-                            'cause': 'Core Network Congestion',
-                            'probability': 0.35,
-                            'indicators': ['High MME CPU', 'S1 congestion', 'Core latency'],
-                            'next_actions': [
-                                'Scale MME capacity',
-                                'Optimize S1 interface',
-                                'Check core connectivity',
-                                'Implement load balancing'
-                            ],
-                            'timeline': {'resolution': '1-2 hours', 'monitoring': '48 hours'}
-                        },
-                        {
-                            'cause': 'Radio Resource Shortage',
-                            'probability': 0.25,
-                            'indicators': ['High PRB utilization', 'RACH overload'],
-                            'next_actions': [
-                                'Add carrier capacity',
-                                'Optimize RACH configuration',
-                                'Implement carrier aggregation'
-                            ],
-                            'timeline': {'resolution': '4-8 hours', 'monitoring': '72 hours'}
-                        },
-                        {
-                            'cause': 'Neighbor Relations Issues',
-                            'probability': 0.20,
-                            'indicators': ['Missing neighbors', 'Handover failures'],
-                            'next_actions': [
-                                'Audit neighbor list',
-                                'Update ANR settings',
-                                'Perform drive test'
-                            ],
-                            'timeline': {'resolution': '2-6 hours', 'monitoring': '24 hours'}
-                        }
-                    ]
-                }
-            },
-            'Bearer Drop Rate': {
-                'thresholds': {'critical': 5, 'major': 2},
-                'root_causes': {
-                    'high': [
-                        {
-                            'cause': 'Handover Failures',
-                            'probability': 0.40,
-                            'indicators': ['High HO failure rate', 'Coverage gaps'],
-                            'next_actions': [
-                                'Optimize handover parameters',
-                                'Check neighbor configuration',
-                                'Perform coverage analysis'
-                            ],
-                            'timeline': {'resolution': '2-4 hours', 'monitoring': '48 hours'}
-                        },
-                        {
-                            'cause': 'Poor Radio Conditions',
-                            'probability': 0.30,
-                            'indicators': ['Low RSRP/RSRQ', 'High interference'],
-                            'next_actions': [
-                                'Check RF conditions',
-                                'Optimize antenna settings',
-                                'Investigate interference'
-                            ],
-                            'timeline': {'resolution': '4-12 hours', 'monitoring': '1 week'}
-                        }
-                    ]
-                }
-            },
-            'RSRP (dBm)': {
-                'thresholds': {'critical': -110, 'major': -100},
-                'reverse_logic': True,  # Lower values are worse
-                'root_causes': {
-                    'high': [
-                        {
-                            'cause': 'Coverage Gap',
-                            'probability': 0.35,
-                            'indicators': ['Distance from cell', 'Terrain obstacles'],
-                            'next_actions': [
-                                'Plan new site deployment',
-                                'Optimize antenna patterns',
-                                'Consider small cells'
-                            ],
-                            'timeline': {'resolution': '1-4 weeks', 'monitoring': '1 month'}
-                        },
-                        {
-                            'cause': 'Antenna/RF Issues',
-                            'probability': 0.25,
-                            'indicators': ['Antenna misalignment', 'Feeder issues'],
-                            'next_actions': [
-                                'Check antenna alignment',
-                                'Test RF components',
-                                'Schedule maintenance'
-                            ],
-                            'timeline': {'resolution': '4-12 hours', 'monitoring': '1 week'}
-                        }
-                    ]
-                }
-            }
-        }
+    def __init__(self, rules_path: Optional[Path] = None, check_interval: float = 2.0):
+        self.rules_path = Path(rules_path or DEFAULT_RULES_PATH)
+        self.check_interval = check_interval
+        self._last_check = 0.0
+        self.reload_rules()
+
+    def _rules_signature(self) -> tuple:
+        stat = os.stat(self.rules_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload_rules(self) -> None:
+        """Compile the rules file; the table is swapped in atomically.
+
+        ``rules_version`` is a hash of the file content, so it is the same in
+        every worker and across restarts, and changes only with the rules.
+        """
+        signature = self._rules_signature()
+        # Hash and parse the same bytes so the version always matches the rules
+        data = self.rules_path.read_bytes()
+        version = hashlib.sha1(data).hexdigest()[:16]
+        rules = parse_rules(data, self.rules_path)
+        # analyze_site reads the rules through here, so both swap together
+        self._cause_matrix = (rules, *self._compile_cause_matrix(rules))
+        self.rca_rules: Dict[str, KPIRule] = rules
+        self.rules_version = version
+        self._signature = signature
+        self._last_check = time.monotonic()
+
+    def maybe_reload_rules(self) -> bool:
+        """
+        Reload if the rules file changed; stat calls are throttled. A file
+        that fails validation is skipped and the current rules stay in use.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        try:
+            signature = self._rules_signature()
+        except OSError:
+            return False
+        if signature == self._signature:
+            return False
+        try:
+            self.reload_rules()
+        except (OSError, ValueError):
+            # A broken file is not retried until it changes again
+            self._signature = signature
+            return False
+        return True
+
+    def _compile_cause_matrix(self, rules: Dict[str, KPIRule]) -> tuple:
+        """
+        (kpis, causes, probabilities) where probabilities[k, c] is how likely
+        cause c is when kpi k is degraded; causes are keyed by name, so one
+        cause listed under several KPIs gets a single column
+        """
+        kpis = tuple(rules)
+        causes: Dict[str, RootCause] = {}
+        for rule in rules.values():
+            for cause in rule.causes_for('critical'):
+                # The most likely listing supplies the actions and timeline
+                known = causes.get(cause.cause)
+                if known is None or cause.probability > known.probability:
+                    causes[cause.cause] = cause
+        columns = {name: i for i, name in enumerate(causes)}
+        probabilities = np.zeros((len(kpis), len(causes)))
+        for k, kpi in enumerate(kpis):
+            for cause in rules[kpi].causes_for('critical'):
+                probabilities[k, columns[cause.cause]] = cause.probability
+        return kpis, tuple(causes.values()), probabilities
 
     def analyze_kpi(self, site_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Perform comprehensive RCA on a site's KPI data
         """
+        self.maybe_reload_rules()
         kpi_type = site_data.get('kpi')
-        value = site_data.get('value')
         
         if kpi_type not in self.rca_rules:
             return self._generic_analysis(site_data)
         
         rules = self.rca_rules[kpi_type]
-        severity = self._determine_severity(value, rules)
+        severity = self._site_severity(site_data, rules)
         root_causes = self._identify_root_causes(severity, rules)
         impact_assessment = self._assess_impact(site_data, severity)
         
@@ -131,7 +111,7 @@ class NetworkRCAEngine:
             'analysis_timestamp': datetime.now().isoformat(),
             'severity': severity,
             'confidence': self._calculate_confidence(site_data, root_causes),
-            'root_causes': root_causes,
+            'root_causes': [cause.to_dict() for cause in root_causes],
             'impact_assessment': impact_assessment,
             'estimated_users_affected': self._estimate_affected_users(site_data, severity),
             'business_impact': self._calculate_business_impact(severity),
@@ -139,62 +119,212 @@ class NetworkRCAEngine:
             'auto_actions': self._suggest_auto_actions(severity, root_causes)
         }
 
-    def _determine_severity(self, value: float, rules: Dict) -> str:
+    def analysis_key(self, site_data: Dict[str, Any]) -> Optional[tuple]:
+        """
+        Everything analyze_kpi's output depends on apart from the site itself
+        and the timestamp, or None when the input cannot be analyzed cheaply
+        """
+        self.maybe_reload_rules()
+        rules = self.rca_rules.get(site_data.get('kpi'))
+        value = site_data.get('value')
+        if rules is None or not isinstance(value, (int, float)) or np.isnan(value):
+            return None
+        severity = self._site_severity(site_data, rules)
+        confidence = self._calculate_confidence(site_data, rules.causes_for(severity))
+        return (self.rules_version, rules.kpi, severity, confidence)
+
+    def _site_severity(self, site_data: Dict[str, Any], rules: KPIRule) -> str:
+        severity = self._determine_severity(site_data.get('value'), rules)
+        zscore = _to_float(site_data.get('baseline_zscore'))
+        if not np.isnan(zscore):
+            # Deviation from the site's own baseline can raise the severity
+            baseline = deviation_severity(np.array([zscore]), rules.reverse_logic)[0]
+            severity = max(severity, baseline, key=SEVERITY_RANK.get)
+        return severity
+
+    def analyze_batch(self, sites: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Perform RCA on many sites at once. Severities are computed with one
+        vectorized threshold comparison per KPI type, and the parts of the
+        analysis that depend only on (kpi, severity) are built once and shared.
+        """
+        self.maybe_reload_rules()
+        kpis = np.array([site.get('kpi') for site in sites], dtype=object)
+        values = np.array([_to_float(site.get('value')) for site in sites], dtype=np.float64)
+        zscores = np.array([_to_float(site.get('baseline_zscore')) for site in sites], dtype=np.float64)
+        severities = np.full(len(sites), None, dtype=object)
+
+        for kpi_type, rules in self.rca_rules.items():
+            mask = (kpis == kpi_type) & ~np.isnan(values)
+            if mask.any():
+                severities[mask] = self._apply_baseline(
+                    self._determine_severity_vector(values[mask], rules), zscores[mask], rules)
+
+        timestamp = datetime.now().isoformat()
+        shared: Dict[tuple, Dict[str, Any]] = {}
+        results = []
+        for site, kpi_type, severity in zip(sites, kpis, severities):
+            if severity is None:
+                results.append(self._generic_analysis(site))
+                continue
+            common = shared.get((kpi_type, severity))
+            if common is None:
+                common = self._severity_analysis(kpi_type, severity)
+                shared[(kpi_type, severity)] = common
+            results.append({
+                'site': site,
+                'analysis_timestamp': timestamp,
+                'severity': severity,
+                'confidence': self._calculate_confidence(site, common['root_causes']),
+                **common
+            })
+        return results
+
+    def analyze_site(self, site_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Perform RCA on every KPI of every sector of a site in one pass.
+
+        Each ``sectorInfo`` entry may carry a ``kpis`` mapping of KPI name to
+        value; site-wide ``kpis`` (and a top-level ``kpi``/``value`` pair)
+        count as one more row. All rules are evaluated over the resulting
+        sector x KPI matrix. A root cause shared by several degraded KPIs is
+        reported once, with the KPIs' probabilities combined by noisy-OR:
+        1 - prod(1 - p). A KPI degraded in several sectors counts once, since
+        those readings are not independent evidence.
+        """
+        self.maybe_reload_rules()
+        rule_table, kpis, causes, probabilities = self._cause_matrix
+        labels, rows, sector_count = _site_kpi_rows(site_data)
+        columns = {kpi: k for k, kpi in enumerate(kpis)}
+        values = np.full((len(rows), len(kpis)), np.nan)
+        unanalyzed = set()
+        for r, row in enumerate(rows):
+            for kpi, value in row.items():
+                if kpi in columns:
+                    values[r, columns[kpi]] = _to_float(value)
+                else:
+                    unanalyzed.add(kpi)
+
+        # Severity rank per cell: -1 where there is no reading
+        ranks = np.full(values.shape, -1, dtype=np.int8)
+        for k, kpi in enumerate(kpis):
+            present = ~np.isnan(values[:, k])
+            if present.any():
+                severities = self._determine_severity_vector(values[present, k], rule_table[kpi])
+                ranks[present, k] = [SEVERITY_RANK[severity] for severity in severities]
+        degraded = ranks >= SEVERITY_RANK['major']
+
+        support = degraded.any(axis=0)[:, None] * probabilities
+        combined = 1.0 - np.prod(1.0 - support, axis=0)
+        order = [c for c in np.argsort(-combined, kind='stable') if combined[c] > 0]
+        root_causes = []
+        for c in order:
+            probability = round(float(combined[c]), 4)
+            root_causes.append(causes[c]._replace(probability=probability, confidence_score=confidence_score(probability)))
+        if ranks.size and ranks.max() >= 0:
+            severity = SEVERITY_NAMES[int(ranks.max())]
+            worst_kpi = kpis[int(np.argmax(ranks.max(axis=0)))]
+        else:
+            severity, worst_kpi = 'minor', None
+
+        cause_details = []
+        for c, cause in zip(order, root_causes):
+            supported = support[:, c] > 0
+            detail = cause.to_dict()
+            detail['supporting_kpis'] = [kpi for kpi, hit in zip(kpis, supported) if hit]
+            detail['sectors'] = [labels[r] for r in np.flatnonzero((degraded & supported).any(axis=1))]
+            cause_details.append(detail)
+
+        sectors = []
+        for r, label in enumerate(labels):
+            readings = np.flatnonzero(ranks[r] >= 0)
+            sectors.append({
+                'sector': label,
+                'severity': SEVERITY_NAMES[int(ranks[r].max())] if len(readings) else None,
+                'kpis': [
+                    {'kpi': kpis[k], 'value': float(values[r, k]), 'severity': SEVERITY_NAMES[int(ranks[r, k])]}
+                    for k in readings
+                ]
+            })
+
+        # The site-wide row overlaps its sectors' users; it counts only for a
+        # site without sector readings
+        user_rows = ranks[:sector_count] if sector_count else ranks
+
+        return {
+            'site': site_data,
+            'analysis_timestamp': datetime.now().isoformat(),
+            'severity': severity,
+            'confidence': self._calculate_confidence(site_data, root_causes),
+            'root_causes': cause_details,
+            'sectors': sectors,
+            'degraded_cells': int(degraded.sum()),
+            'unanalyzed_kpis': sorted(unanalyzed),
+            'impact_assessment': self._assess_impact({'kpi': worst_kpi}, severity),
+            'estimated_users_affected': sum(
+                self._estimate_affected_users(site_data, SEVERITY_NAMES[int(rank)])
+                for rank in user_rows.max(axis=1, initial=-1) if rank >= SEVERITY_RANK['major']
+            ),
+            'business_impact': self._calculate_business_impact(severity),
+            'recommendations': self._generate_recommendations(root_causes),
+            'auto_actions': self._suggest_auto_actions(severity, root_causes)
+        }
+
+    def _severity_analysis(self, kpi_type: str, severity: str) -> Dict[str, Any]:
+        """Analysis fields that depend only on the KPI type and severity"""
+        root_causes = self._identify_root_causes(severity, self.rca_rules[kpi_type])
+        return {
+            'root_causes': [cause.to_dict() for cause in root_causes],
+            'impact_assessment': self._assess_impact({'kpi': kpi_type}, severity),
+            'estimated_users_affected': self._estimate_affected_users({'kpi': kpi_type}, severity),
+            'business_impact': self._calculate_business_impact(severity),
+            'recommendations': self._generate_recommendations(root_causes),
+            'auto_actions': self._suggest_auto_actions(severity, root_causes)
+        }
+
+    def _determine_severity_vector(self, values: np.ndarray, rules: KPIRule) -> np.ndarray:
+        """Vectorized form of _determine_severity over an array of values"""
+        if rules.reverse_logic:
+            conditions = [values < rules.critical, values < rules.major]
+        else:
+            conditions = [values > rules.critical, values > rules.major]
+        return np.select(conditions, ['critical', 'major'], default='minor').astype(object)
+
+    def _apply_baseline(self, severities: np.ndarray, zscores: np.ndarray, rules: KPIRule) -> np.ndarray:
+        """Raise threshold severities where a site deviates from its own baseline"""
+        if np.isnan(zscores).all():
+            return severities
+        baseline = deviation_severity(zscores, rules.reverse_logic)
+        raise_to = np.array([SEVERITY_RANK[b] > SEVERITY_RANK[s] for s, b in zip(severities, baseline)], dtype=bool)
+        return np.where(raise_to, baseline, severities)
+
+    def _determine_severity(self, value: float, rules: KPIRule) -> str:
         """Determine severity level based on thresholds"""
-        thresholds = rules['thresholds']
-        reverse_logic = rules.get('reverse_logic', False)
-        
-        if reverse_logic:
+        if rules.reverse_logic:
             # For metrics where lower values are worse (RSRP, RSRQ, etc.)
-            if value < thresholds['critical']:
+            if value < rules.critical:
                 return 'critical'
-            elif value < thresholds['major']:
+            elif value < rules.major:
                 return 'major'
             else:
                 return 'minor'
         else:
             # For metrics where higher values are worse (failure rates, etc.)
-            if value > thresholds['critical']:
+            if value > rules.critical:
                 return 'critical'
-            elif value > thresholds['major']:
+            elif value > rules.major:
                 return 'major'
             else:
                 return 'minor'
 
-    def _identify_root_causes(self, severity: str, rules: Dict) -> List[Dict]:
-        """Identify most probable root causes"""
-        cause_level = 'high' if severity in ['critical', 'major'] else 'moderate'
-        causes = rules['root_causes'].get(cause_level, rules['root_causes'].get('high', []))
-        
-        # Sort by probability and add confidence scores
-        for cause in causes:
-            cause['confidence_score'] = self._calculate_cause_confidence(cause)
-        
-        return sorted(causes, key=lambda x: x['probability'], reverse=True)
+    def _identify_root_causes(self, severity: str, rules: KPIRule) -> Sequence[RootCause]:
+        """Identify most probable root causes (pre-sorted by probability)"""
+        return rules.causes_for(severity)
 
     def _assess_impact(self, site_data: Dict, severity: str) -> Dict:
         """Assess the impact of the KPI degradation"""
-        kpi_type = site_data.get('kpi')
-        
-        impact_map = {
-            'RRC Setup Failure Rate': {
-                'critical': 'Users cannot connect - service unavailable',
-                'major': 'Connection delays - poor user experience',
-                'minor': 'Occasional connection issues'
-            },
-            'Bearer Drop Rate': {
-                'critical': 'Frequent call drops - severe service degradation',
-                'major': 'Intermittent drops - reduced reliability',
-                'minor': 'Rare connection interruptions'
-            },
-            'RSRP (dBm)': {
-                'critical': 'No coverage - service unavailable',
-                'major': 'Poor signal - degraded performance',
-                'minor': 'Weak signal - minor quality issues'
-            }
-        }
-        
-        user_experience = impact_map.get(kpi_type, {}).get(severity, 'Unknown impact')
+        rules = self.rca_rules.get(site_data.get('kpi'))
+        user_experience = rules.impact.get(severity, 'Unknown impact') if rules else 'Unknown impact'
         
         return {
             'user_experience': user_experience,
@@ -221,25 +351,26 @@ class NetworkRCAEngine:
             'competitive_risk': 'High' if severity == 'critical' else 'Medium' if severity == 'major' else 'Low'
         }
 
-    def _generate_recommendations(self, root_causes: List[Dict]) -> List[Dict]:
+    def _generate_recommendations(self, root_causes: Sequence[RootCause]) -> List[Dict]:
         """Generate prioritized recommendations"""
         recommendations = []
         
         for i, cause in enumerate(root_causes[:3]):  # Top 3 causes
-            for j, action in enumerate(cause['next_actions'][:2]):  # Top 2 actions per cause
+            resolution, monitoring = cause.timeline or ('2-4 hours', '24 hours')
+            for j, action in enumerate(cause.next_actions[:2]):  # Top 2 actions per cause
                 recommendations.append({
                     'id': f"rec_{i}_{j}",
                     'priority': 'high' if i == 0 else 'medium' if i == 1 else 'low',
                     'action': action,
-                    'root_cause': cause['cause'],
-                    'estimated_effort': self._estimate_effort(action),
-                    'success_probability': cause['probability'] * 0.8,
-                    'timeline': cause.get('timeline', {'resolution': '2-4 hours', 'monitoring': '24 hours'})
+                    'root_cause': cause.cause,
+                    'estimated_effort': cause.efforts[j],
+                    'success_probability': cause.probability * 0.8,
+                    'timeline': {'resolution': resolution, 'monitoring': monitoring}
                 })
         
         return recommendations
 
-    def _suggest_auto_actions(self, severity: str, root_causes: List[Dict]) -> List[Dict]:
+    def _suggest_auto_actions(self, severity: str, root_causes: Sequence[RootCause]) -> List[Dict]:
         """Suggest actions that can be automated"""
         auto_actions = []
         
@@ -252,7 +383,7 @@ class NetworkRCAEngine:
             })
         
         if root_causes:
-            primary_cause = root_causes[0]['cause']
+            primary_cause = root_causes[0].cause
             if 'monitoring' in primary_cause.lower() or 'configuration' in primary_cause.lower():
                 auto_actions.append({
                     'action': 'Configuration audit',
@@ -263,7 +394,7 @@ class NetworkRCAEngine:
         
         return auto_actions
 
-    def _calculate_confidence(self, site_data: Dict, root_causes: List[Dict]) -> float:
+    def _calculate_confidence(self, site_data: Dict, root_causes: Sequence) -> float:
         """Calculate overall confidence in the analysis"""
         base_confidence = 0.7
         
@@ -279,10 +410,6 @@ class NetworkRCAEngine:
         
         return min(base_confidence, 0.95)
 
-    def _calculate_cause_confidence(self, cause: Dict) -> float:
-        """Calculate confidence for individual root cause"""
-        return min(cause['probability'] * 1.2, 0.95)
-
     def _calculate_availability_impact(self, severity: str) -> str:
         impact_map = {
             'critical': 'Service unavailable (0-20% availability)',
@@ -307,17 +434,6 @@ class NetworkRCAEngine:
         }
         return risk_map.get(severity, 'Unknown')
 
-    def _estimate_effort(self, action: str) -> str:
-        """Estimate effort required for an action"""
-        if any(word in action.lower() for word in ['check', 'monitor', 'review']):
-            return 'Low (1-2 hours)'
-        elif any(word in action.lower() for word in ['optimize', 'configure', 'update']):
-            return 'Medium (4-8 hours)'
-        elif any(word in action.lower() for word in ['deploy', 'install', 'replace']):
-            return 'High (1-2 days)'
-        else:
-            return 'Medium (4-8 hours)'
-
     def _generic_analysis(self, site_data: Dict) -> Dict:
         """Fallback analysis for unknown KPI types"""
         return {
@@ -349,26 +465,101 @@ class NetworkRCAEngine:
             'auto_actions': []
         }
 
-# Singleton instance
-rca_engine = NetworkRCAEngine()
+def _site_kpi_rows(site_data: Dict[str, Any]) -> tuple:
+    """
+    (labels, KPI mappings, sector count) for each sector of a site, followed
+    by its site-wide readings
+    """
+    labels, rows = [], []
+    for i, sector in enumerate(site_data.get('sectorInfo') or []):
+        if sector.get('kpis'):
+            labels.append(str(sector.get('cellId') or f'sector_{i + 1}'))
+            rows.append(sector['kpis'])
+    sector_count = len(rows)
+    site_wide = dict(site_data.get('kpis') or {})
+    if site_data.get('kpi') is not None and 'value' in site_data:
+        site_wide.setdefault(site_data['kpi'], site_data['value'])
+    if site_wide:
+        labels.append('site')
+        rows.append(site_wide)
+    return labels, rows, sector_count
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+# Singleton instance; RCA_RULES_PATH points at an alternative JSON/YAML rules file
+rca_engine = NetworkRCAEngine(os.environ.get('RCA_RULES_PATH'))
+
+# Latest severity per analyzed site, with per-market rollups
+severity_index = SeverityIndex()
+
+# Site-independent analysis fields keyed on RCAEngine.analysis_key; the key
+# carries rules_version, the rules file's content hash, so editing the rules
+# retires every entry
+analysis_cache = TTLCache(
+    maxsize=int(os.environ.get('RCA_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('RCA_CACHE_TTL', 3600))
+)
 
 def perform_rca_analysis(site_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Main function to perform RCA analysis
     """
-    return rca_engine.analyze_kpi(site_data)
+    analysis = rca_engine.analyze_kpi(site_data)
+    severity_index.record_analysis(analysis)
+    return analysis
+
+def analysis_etag(site_data: Dict[str, Any]) -> Optional[str]:
+    """
+    ETag for the analysis of a site, derived from its inputs so it can be
+    checked without running the analysis
+    """
+    key = rca_engine.analysis_key(site_data)
+    if key is None:
+        return None
+    return hashlib.sha1(repr((key, site_data.get('id'))).encode()).hexdigest()
+
+def perform_cached_rca_analysis(site_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    perform_rca_analysis, reusing the result for sites with the same KPI,
+    severity band and confidence inputs
+    """
+    key = rca_engine.analysis_key(site_data)
+    if key is None:
+        return perform_rca_analysis(site_data)
+    common = analysis_cache.get(key)
+    if common is None:
+        analysis = rca_engine.analyze_kpi(site_data)
+        common = {k: v for k, v in analysis.items() if k not in ('site', 'analysis_timestamp')}
+        analysis_cache.set(key, common)
+    analysis = {'site': site_data, 'analysis_timestamp': datetime.now().isoformat(), **common}
+    severity_index.record_analysis(analysis)
+    return analysis
+
+def perform_site_rca_analysis(site_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Perform one combined RCA over all sectors and KPIs of a site
+    """
+    analysis = rca_engine.analyze_site(site_data)
+    severity_index.record_analysis(analysis)
+    return analysis
+
+def perform_batch_rca_analysis(sites: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Perform RCA analysis for a list of sites in one pass
+    """
+    results = rca_engine.analyze_batch(sites)
+    for analysis in results:
+        severity_index.record_analysis(analysis)
+    return results
 
-def get_rca_summary(site_ids: List[str]) -> Dict[str, Any]:
+def get_rca_summary(site_ids: List[str], market: Optional[str] = None) -> Dict[str, Any]:
     """
-    Get RCA summary for multiple sites
+    Get RCA summary for multiple sites, or for a whole market when given
     """
-    # This would typically fetch data from database
-    # For now, return mock summary
-    return {
-        'total_sites': len(site_ids),
-        'critical_issues': random.randint(0, len(site_ids) // 3),
-        'major_issues': random.randint(0, len(site_ids) // 2),
-        'auto_resolvable': random.randint(0, len(site_ids) // 4),
-        'estimated_resolution_time': '2-8 hours',
-        'confidence_avg': 0.82
-    }
+    if market:
+        return severity_index.summarize_market(market)
+    return severity_index.summarize_sites(site_ids)
@@ -0,0 +1,170 @@
+# RCA rule loading and compilation
+# Rules are read from JSON (or YAML when PyYAML is installed), validated, and
+# compiled once into immutable tuples so analysis never walks or mutates dicts.
+
+import json
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+DEFAULT_RULES_PATH = Path(__file__).with_name('rca_rules.json')
+
+SEVERITIES = ('critical', 'major', 'minor')
+
+
+class RuleValidationError(ValueError):
+    """Raised when a rules file does not match the expected schema"""
+
+
+class RootCause(NamedTuple):
+    cause: str
+    probability: float
+    confidence_score: float
+    indicators: Tuple[str, ...]
+    next_actions: Tuple[str, ...]
+    efforts: Tuple[str, ...]  # estimated effort for each entry in next_actions
+    timeline: Optional[Tuple[str, str]]  # (resolution, monitoring)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'cause': self.cause,
+            'probability': self.probability,
+            'indicators': list(self.indicators),
+            'next_actions': list(self.next_actions),
+        }
+        if self.timeline is not None:
+            data['timeline'] = {'resolution': self.timeline[0], 'monitoring': self.timeline[1]}
+        data['confidence_score'] = self.confidence_score
+        return data
+
+
+class KPIRule(NamedTuple):
+    kpi: str
+    critical: float
+    major: float
+    reverse_logic: bool
+    impact: Mapping[str, str]
+    root_causes: Mapping[str, Tuple[RootCause, ...]]  # level -> causes sorted by probability
+
+    def causes_for(self, severity: str) -> Tuple[RootCause, ...]:
+        level = 'high' if severity in ('critical', 'major') else 'moderate'
+        return self.root_causes.get(level, self.root_causes.get('high', ()))
+
+
+def estimate_effort(action: str) -> str:
+    """Estimate effort required for an action"""
+    text = action.lower()
+    if any(word in text for word in ['check', 'monitor', 'review']):
+        return 'Low (1-2 hours)'
+    elif any(word in text for word in ['optimize', 'configure', 'update']):
+        return 'Medium (4-8 hours)'
+    elif any(word in text for word in ['deploy', 'install', 'replace']):
+        return 'High (1-2 days)'
+    else:
+        return 'Medium (4-8 hours)'
+
+
+def load_rules(path: Optional[Path] = None) -> Dict[str, KPIRule]:
+    """Load, validate and compile a rules file"""
+    path = Path(path or DEFAULT_RULES_PATH)
+    return parse_rules(path.read_bytes(), path)
+
+
+def parse_rules(data: bytes, path: Path = DEFAULT_RULES_PATH) -> Dict[str, KPIRule]:
+    """Validate and compile rules file content; ``path`` selects JSON or YAML"""
+    if path.suffix in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise RuleValidationError(f'PyYAML is required to load {path}') from e
+        raw = yaml.safe_load(data)
+    else:
+        raw = json.loads(data)
+    return compile_rules(raw)
+
+
+def compile_rules(raw: Any) -> Dict[str, KPIRule]:
+    """Validate a rules mapping and compile it into KPIRule tuples"""
+    _expect(isinstance(raw, dict) and raw, 'rules', 'must be a non-empty object keyed by KPI name')
+    return {kpi: _compile_kpi(kpi, spec) for kpi, spec in raw.items()}
+
+
+def _compile_kpi(kpi: str, spec: Any) -> KPIRule:
+    where = f'rules[{kpi!r}]'
+    _expect(isinstance(spec, dict), where, 'must be an object')
+
+    thresholds = spec.get('thresholds')
+    _expect(isinstance(thresholds, dict), f'{where}.thresholds', 'must be an object')
+    for level in ('critical', 'major'):
+        _expect(_is_number(thresholds.get(level)), f'{where}.thresholds.{level}', 'must be a number')
+    reverse_logic = spec.get('reverse_logic', False)
+    _expect(isinstance(reverse_logic, bool), f'{where}.reverse_logic', 'must be a boolean')
+    critical, major = thresholds['critical'], thresholds['major']
+    if reverse_logic:
+        _expect(critical <= major, f'{where}.thresholds', 'critical must be <= major when reverse_logic is set')
+    else:
+        _expect(critical >= major, f'{where}.thresholds', 'critical must be >= major')
+
+    impact = spec.get('impact', {})
+    _expect(isinstance(impact, dict) and set(impact) <= set(SEVERITIES)
+            and all(isinstance(v, str) for v in impact.values()),
+            f'{where}.impact', f'must map {"/".join(SEVERITIES)} to strings')
+
+    levels = spec.get('root_causes')
+    _expect(isinstance(levels, dict) and levels, f'{where}.root_causes', 'must be a non-empty object')
+    root_causes = {}
+    for level, causes in levels.items():
+        _expect(isinstance(causes, list), f'{where}.root_causes.{level}', 'must be a list')
+        compiled = [_compile_cause(f'{where}.root_causes.{level}[{i}]', c) for i, c in enumerate(causes)]
+        root_causes[level] = tuple(sorted(compiled, key=lambda c: c.probability, reverse=True))
+
+    return KPIRule(
+        kpi=kpi,
+        critical=float(critical),
+        major=float(major),
+        reverse_logic=reverse_logic,
+        impact=MappingProxyType(dict(impact)),
+        root_causes=MappingProxyType(root_causes),
+    )
+
+
+def _compile_cause(where: str, spec: Any) -> RootCause:
+    _expect(isinstance(spec, dict), where, 'must be an object')
+    _expect(isinstance(spec.get('cause'), str), f'{where}.cause', 'must be a string')
+    probability = spec.get('probability')
+    _expect(_is_number(probability) and 0 <= probability <= 1, f'{where}.probability', 'must be between 0 and 1')
+    for field in ('indicators', 'next_actions'):
+        value = spec.get(field, [])
+        _expect(isinstance(value, list) and all(isinstance(v, str) for v in value),
+                f'{where}.{field}', 'must be a list of strings')
+
+    timeline = spec.get('timeline')
+    if timeline is not None:
+        _expect(isinstance(timeline, dict) and all(isinstance(timeline.get(k), str) for k in ('resolution', 'monitoring')),
+                f'{where}.timeline', 'must have string resolution and monitoring')
+        timeline = (timeline['resolution'], timeline['monitoring'])
+
+    next_actions = tuple(spec.get('next_actions', []))
+    return RootCause(
+        cause=spec['cause'],
+        probability=probability,
+        confidence_score=confidence_score(probability),
+        indicators=tuple(spec.get('indicators', [])),
+        next_actions=next_actions,
+        efforts=tuple(estimate_effort(action) for action in next_actions),
+        timeline=timeline,
+    )
+
+
+def confidence_score(probability: float) -> float:
+    """Confidence reported for a cause with the given probability"""
+    return min(probability * 1.2, 0.95)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _expect(condition: Any, where: str, message: str) -> None:
+    if not condition:
+        raise RuleValidationError(f'{where} {message}')
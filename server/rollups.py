@@ -0,0 +1,227 @@
+from __future__ import annotations
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+
+# (kpi, geo, site_id or None for the geo-wide rollup)
+RollupKey = Tuple[str, str, Optional[str]]
+
+
+class _Buckets:
+    """Sorted bucket ids with their sample counts and value sums.
+
+    The three arrays are swapped in as one tuple so readers never see a
+    half-merged state.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+    def merge(self, ids: np.ndarray, counts: np.ndarray, sums: np.ndarray) -> None:
+        """Fold pre-aggregated, sorted buckets in."""
+        old_ids, old_counts, old_sums = self.data
+        if not len(old_ids):
+            self.data = (ids, counts, sums)
+            return
+        if ids[0] > old_ids[-1]:
+            # Common streaming case: new buckets all come after existing ones.
+            self.data = (
+                np.concatenate([old_ids, ids]),
+                np.concatenate([old_counts, counts]),
+                np.concatenate([old_sums, sums]),
+            )
+            return
+        merged, inverse = np.unique(np.concatenate([old_ids, ids]), return_inverse=True)
+        self.data = (
+            merged,
+            np.bincount(inverse, weights=np.concatenate([old_counts, counts]), minlength=len(merged)),
+            np.bincount(inverse, weights=np.concatenate([old_sums, sums]), minlength=len(merged)),
+        )
+
+
+class RollupIndex:
+    """Hourly and daily (count, sum) buckets per (kpi, geo) and (kpi, geo, site).
+
+    Buckets are integer epoch hours/days kept as sorted arrays per key.
+    ``add`` aggregates a batch of samples with NumPy and merges the result
+    into the existing buckets, so rollups are maintained incrementally as
+    data is ingested.
+    """
+
+    def __init__(self):
+        self._tables: Dict[str, Dict[RollupKey, _Buckets]] = {r: {} for r in RESOLUTIONS}
+        self._packed: Dict[str, _PackedBuckets] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_packed(
+        cls,
+        packed: Dict[str, Dict[str, np.ndarray]],
+        series_codes: Dict[Tuple[str, str], int],
+        site_codes: Dict[str, int],
+    ) -> "RollupIndex":
+        """Rollups backed by exported (e.g. memory-mapped) arrays.
+
+        Keys are looked up in the packed arrays on demand; a key only gets
+        its own ``_Buckets`` once new samples are merged into it.
+        """
+        index = cls()
+        index._packed = {
+            resolution: _PackedBuckets(arrays, series_codes, site_codes) for resolution, arrays in packed.items()
+        }
+        return index
+
+    def export(
+        self, series_codes: Dict[Tuple[str, str], int], site_codes: Dict[str, int]
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """Flatten every key's buckets into arrays ordered by (series code, site code).
+
+        Geo-wide keys use site code -1. ``from_packed`` reverses this.
+        """
+        exported = {}
+        for resolution in RESOLUTIONS:
+            entries = {}
+            packed = self._packed.get(resolution)
+            if packed is not None:
+                entries.update(packed.items(series_codes, site_codes))
+            for (kpi, geo, site), buckets in self._tables[resolution].items():
+                entries[(series_codes[(kpi, geo)], -1 if site is None else site_codes[site])] = buckets.data
+            order = sorted(entries)
+            data = [entries[key] for key in order]
+            lengths = [len(ids) for ids, _, _ in data]
+            exported[resolution] = {
+                "key_series": np.array([key[0] for key in order], dtype=np.int32),
+                "key_site": np.array([key[1] for key in order], dtype=np.int32),
+                "offsets": np.cumsum([0] + lengths).astype(np.int64),
+                "ids": np.concatenate([d[0] for d in data]).astype(np.int64) if data else np.empty(0, np.int64),
+                "counts": np.concatenate([d[1] for d in data]) if data else np.empty(0),
+                "sums": np.concatenate([d[2] for d in data]) if data else np.empty(0),
+            }
+        return exported
+
+    def _entry(self, resolution: str, key: RollupKey) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        entry = self._tables[resolution].get(key)
+        if entry is not None:
+            return entry.data
+        packed = self._packed.get(resolution)
+        return packed.get(key) if packed is not None else None
+
+    def _buckets_for(self, resolution: str, key: RollupKey) -> _Buckets:
+        table = self._tables[resolution]
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = _Buckets()
+            packed = self._packed.get(resolution)
+            data = packed.get(key) if packed is not None else None
+            if data is not None:
+                entry.data = data
+        return entry
+
+    def add(
+        self,
+        kpi: str,
+        geo: str,
+        sites: Sequence,
+        seconds: np.ndarray,
+        values: np.ndarray,
+        site_names: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Fold samples (per-sample site ids, epoch seconds, values) into the rollups.
+
+        With ``site_names``, ``sites`` holds integer codes into it instead.
+        """
+        if not len(values):
+            return
+        if site_names is None:
+            site_codes, site_names = _encode(sites)
+        else:
+            site_codes = np.asarray(sites, dtype=np.int64)
+        seconds = np.asarray(seconds, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        order = np.lexsort((seconds, site_codes))
+        site_codes, seconds, values = site_codes[order], seconds[order], values[order]
+
+        with self._lock:
+            for resolution, width in RESOLUTIONS.items():
+                buckets = seconds // width
+                # Site-level: runs of equal (site, bucket) in the sorted samples.
+                starts = np.flatnonzero(np.r_[True, (np.diff(buckets) != 0) | (np.diff(site_codes) != 0)])
+                ids, pair_sites = buckets[starts], site_codes[starts]
+                counts = np.diff(np.r_[starts, len(buckets)]).astype(np.float64)
+                sums = np.add.reduceat(values, starts)
+                site_starts = np.flatnonzero(np.r_[True, np.diff(pair_sites) != 0])
+                for lo, hi in zip(site_starts, np.r_[site_starts[1:], len(ids)]):
+                    key = (kpi, geo, site_names[pair_sites[lo]])
+                    self._buckets_for(resolution, key).merge(ids[lo:hi], counts[lo:hi], sums[lo:hi])
+                # Geo-wide: re-aggregate the site-level buckets by bucket id.
+                geo_ids, inverse = np.unique(ids, return_inverse=True)
+                self._buckets_for(resolution, (kpi, geo, None)).merge(
+                    geo_ids,
+                    np.bincount(inverse, weights=counts, minlength=len(geo_ids)),
+                    np.bincount(inverse, weights=sums, minlength=len(geo_ids)),
+                )
+
+    def buckets(
+        self,
+        kpi: str,
+        geo: str,
+        site: Optional[str] = None,
+        resolution: str = "day",
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(bucket ids, counts, sums) in ascending order for ``start <= bucket < end``."""
+        data = self._entry(resolution, (kpi, geo, site))
+        if data is None:
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty, empty
+        ids, counts, sums = data
+        lo = 0 if start is None else int(np.searchsorted(ids, start, side="left"))
+        hi = len(ids) if end is None else int(np.searchsorted(ids, end, side="left"))
+        return ids[lo:hi], counts[lo:hi], sums[lo:hi]
+
+
+class _PackedBuckets:
+    """Read-only buckets of many keys in flat arrays, as written by ``RollupIndex.export``."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], series_codes: Dict[Tuple[str, str], int], site_codes: Dict[str, int]):
+        self.series_codes = series_codes
+        self.site_codes = site_codes
+        self.sites_per_series = len(site_codes) + 1
+        self.keys = arrays["key_series"].astype(np.int64) * self.sites_per_series + (arrays["key_site"] + 1)
+        self.offsets = arrays["offsets"]
+        self.ids, self.counts, self.sums = arrays["ids"], arrays["counts"], arrays["sums"]
+
+    def get(self, key: RollupKey) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        kpi, geo, site = key
+        series = self.series_codes.get((kpi, geo))
+        site_code = -1 if site is None else self.site_codes.get(site)
+        if series is None or site_code is None or site_code >= self.sites_per_series - 1:
+            return None
+        composite = series * self.sites_per_series + site_code + 1
+        i = int(np.searchsorted(self.keys, composite))
+        if i == len(self.keys) or self.keys[i] != composite:
+            return None
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.ids[lo:hi], self.counts[lo:hi], self.sums[lo:hi]
+
+    def items(self, series_codes: Dict[Tuple[str, str], int], site_codes: Dict[str, int]):
+        """((series code, site code) in the given coding, data) for every packed key."""
+        series_names = {code: key for key, code in self.series_codes.items()}
+        site_names = {code: site for site, code in self.site_codes.items()}
+        for i, composite in enumerate(self.keys.tolist()):
+            series, site = divmod(composite, self.sites_per_series)
+            name = site_names[site - 1] if site else None
+            lo, hi = self.offsets[i], self.offsets[i + 1]
+            code = (series_codes[series_names[series]], -1 if name is None else site_codes[name])
+            yield code, (self.ids[lo:hi], self.counts[lo:hi], self.sums[lo:hi])
+
+
+def _encode(sites: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    names, codes = np.unique(np.asarray(sites, dtype=str), return_inverse=True)
+    return codes.ravel().astype(np.int64), names.tolist()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+SEVERITY_RANK = {"minor": 0, "major": 1, "critical": 2}
+
+
+class SiteSeverity:
+    __slots__ = ("severity", "market", "auto_resolvable", "confidence", "resolution", "kpi")
+
+    def __init__(
+        self,
+        severity: str,
+        market: str,
+        auto_resolvable: bool,
+        confidence: float,
+        resolution: Optional[str],
+        kpi: Optional[str] = None,
+    ):
+        self.severity = severity
+        self.market = market
+        self.auto_resolvable = auto_resolvable
+        self.confidence = confidence
+        self.resolution = resolution
+        self.kpi = kpi
+
+
+class _Rollup:
+    __slots__ = ("severities", "auto_resolvable", "confidence_sum", "sites")
+
+    def __init__(self):
+        self.severities: Counter = Counter()
+        self.auto_resolvable = 0
+        self.confidence_sum = 0.0
+        self.sites = 0
+
+    def apply(self, record: SiteSeverity, sign: int) -> None:
+        self.severities[record.severity] += sign
+        self.auto_resolvable += sign * record.auto_resolvable
+        self.confidence_sum += sign * record.confidence
+        self.sites += sign
+
+
+class SeverityIndex:
+    """Latest RCA severity per site plus per-market rollups.
+
+    Records are kept per (site, KPI); a site's severity is that of its worst
+    KPI. Each new analysis replaces the (site, KPI) record and adjusts the
+    market rollup by the difference, so summaries never rescan all sites.
+    Site ids are resolved through ``set_aliases`` first, so a site reported
+    by id, geoId or eNodeB is counted once.
+    """
+
+    def __init__(self):
+        self._sites: Dict[str, SiteSeverity] = {}
+        self._kpis: Dict[str, Dict[Optional[str], SiteSeverity]] = {}
+        self._aliases: Dict[str, str] = {}
+        self._markets: Dict[str, _Rollup] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, SiteSeverity], None]] = []
+
+    def set_aliases(self, aliases: Dict[Any, Any]) -> None:
+        """Map alternative site ids (geoId, eNodeB, ...) to one canonical key."""
+        self._aliases = {str(alias): str(key) for alias, key in aliases.items()}
+
+    def key(self, site_id: Any) -> str:
+        """The canonical key a site id is recorded under."""
+        return self._aliases.get(str(site_id), str(site_id))
+
+    def add_listener(self, callback: Callable[[str, SiteSeverity], None]) -> None:
+        """Register a callback invoked with (site_id, record) for every new record."""
+        self._listeners.append(callback)
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def record(self, site_id: Any, record: SiteSeverity) -> None:
+        key = self.key(site_id)
+        with self._lock:
+            by_kpi = self._kpis.setdefault(key, {})
+            by_kpi[record.kpi] = record
+            worst = max(by_kpi.values(), key=lambda r: SEVERITY_RANK.get(r.severity, 0))
+            if SEVERITY_RANK.get(record.severity, 0) == SEVERITY_RANK.get(worst.severity, 0):
+                worst = record
+            previous = self._sites.get(key)
+            if previous is not None:
+                self._markets[previous.market].apply(previous, -1)
+            self._sites[key] = worst
+            self._markets.setdefault(worst.market, _Rollup()).apply(worst, 1)
+        for callback in self._listeners:
+            callback(key, worst)
+
+    def record_analysis(self, analysis: Dict[str, Any]) -> None:
+        """Index an RCA result produced by NetworkRCAEngine."""
+        site = analysis.get("site") or {}
+        if site.get("id") is None:
+            return
+        recommendations = analysis.get("recommendations") or []
+        resolution = recommendations[0].get("timeline", {}).get("resolution") if recommendations else None
+        self.record(site["id"], SiteSeverity(
+            severity=analysis.get("severity", "minor"),
+            market=str(site.get("market") or site.get("state") or "Unknown"),
+            auto_resolvable=bool(analysis.get("auto_actions")),
+            confidence=float(analysis.get("confidence") or 0.0),
+            resolution=resolution,
+            kpi=site.get("kpi"),
+        ))
+
+    def get(self, site_id: Any) -> Optional[SiteSeverity]:
+        """The site's rolled-up record: that of its worst KPI."""
+        return self._sites.get(self.key(site_id))
+
+    def summarize_sites(self, site_ids: Iterable[Any]) -> Dict[str, Any]:
+        rollup = _Rollup()
+        worst: Optional[SiteSeverity] = None
+        # Several ids (id, geoId, eNodeB) may name the same site
+        keys = dict.fromkeys(self.key(site_id) for site_id in site_ids)
+        total = len(keys)
+        for key in keys:
+            record = self._sites.get(key)
+            if record is None:
+                continue
+            rollup.apply(record, 1)
+            if worst is None or SEVERITY_RANK.get(record.severity, 0) > SEVERITY_RANK.get(worst.severity, 0):
+                worst = record
+        return self._format(rollup, total, worst.resolution if worst else None)
+
+    def summarize_market(self, market: str) -> Dict[str, Any]:
+        rollup = self._markets.get(market) or _Rollup()
+        return self._format(rollup, rollup.sites, None)
+
+    @staticmethod
+    def _format(rollup: _Rollup, total: int, resolution: Optional[str]) -> Dict[str, Any]:
+        return {
+            "total_sites": total,
+            "analyzed_sites": rollup.sites,
+            "critical_issues": rollup.severities["critical"],
+            "major_issues": rollup.severities["major"],
+            "auto_resolvable": rollup.auto_resolvable,
+            "estimated_resolution_time": resolution or "2-8 hours",
+            "confidence_avg": round(rollup.confidence_sum / rollup.sites, 2) if rollup.sites else 0.0,
+        }
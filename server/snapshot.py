@@ -0,0 +1,130 @@
+"""Prebuilt, memory-mappable snapshot of the KPI store and its rollups.
+
+Layout::
+
+    b"AWSPSNAP" | u32 version | u32 pad | u64 header length | header JSON
+    then 64-byte aligned arrays, described in the header by name, dtype,
+    shape and offset
+
+Loading maps the file and wraps each array with ``np.frombuffer``, so
+nothing is parsed or copied. Forked workers share the pages through the
+OS page cache. The header records the signature of the source file the
+snapshot was built from, so a stale snapshot is ignored and the store
+falls back to parsing.
+
+    python snapshot.py [out.snapshot]   # build from kpi.db / sample_kpi.csv
+"""
+
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"AWSPSNAP"
+VERSION = 1
+ALIGN = 64
+_PREAMBLE = struct.Struct("<8sIIQ")
+
+
+class Snapshot:
+    """A mapped snapshot: ``header`` plus zero-copy, read-only ``arrays``."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, header_len = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a KPI snapshot")
+        if version != VERSION:
+            raise ValueError(f"{self.path} has snapshot version {version}, expected {VERSION}")
+        self.header: Dict[str, Any] = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + header_len])
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.frombuffer(
+                self._map, dtype=np.dtype(spec["dtype"]), count=int(np.prod(spec["shape"])), offset=spec["offset"]
+            ).reshape(spec["shape"])
+            for name, spec in self.header["arrays"].items()
+        }
+
+    @property
+    def signature(self) -> Optional[Tuple[str, int, int]]:
+        signature = self.header.get("source_signature")
+        return tuple(signature) if signature else None
+
+
+def write_snapshot(path: Path, header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> int:
+    """Write ``arrays`` with ``header`` atomically; returns the file size."""
+    specs, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    # Offsets in the header depend on the header's own length; grow the
+    # reserved space until it fits.
+    start = ALIGN
+    while True:
+        header_specs = {name: {**spec, "offset": spec["offset"] + start} for name, spec in specs.items()}
+        encoded = json.dumps({**header, "arrays": header_specs}).encode()
+        if _PREAMBLE.size + len(encoded) <= start:
+            break
+        start = -(-(_PREAMBLE.size + len(encoded)) // ALIGN) * ALIGN
+
+    tmp = Path(path).with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, 0, len(encoded)))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.seek(header_specs[name]["offset"])
+            f.write(memoryview(array).cast("B"))
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+    return start + offset
+
+
+def build_snapshot(store, path: Path) -> int:
+    """Serialize a loaded ``KPIStore``: series columns, site ids and rollups."""
+    series_keys = list(store.series)
+    columns = [store.series[key] for key in series_keys]
+    bounds = np.cumsum([0] + [len(s) for s in columns])
+    arrays: Dict[str, np.ndarray] = {
+        "series_offsets": bounds.astype(np.int64),
+        "dates": _concat([s.dates.astype(np.int64) for s in columns], np.int64),
+        "values": _concat([s.values for s in columns], np.float64),
+        "sites": _concat([s.sites for s in columns], np.int32),
+    }
+    series_codes = {key: code for code, key in enumerate(series_keys)}
+    site_codes = {site: code for code, site in enumerate(store.site_ids)}
+    for resolution, packed in store.rollups.export(series_codes, site_codes).items():
+        for name, array in packed.items():
+            arrays[f"rollup_{resolution}_{name}"] = array
+    header = {
+        "created": time.time(),
+        "source_signature": list(store._signature) if store._signature else None,
+        "latest": None if store.latest is None else int(store.latest.astype(np.int64)),
+        "series": [list(key) for key in series_keys],
+        "site_ids": [str(site) for site in store.site_ids],
+    }
+    return write_snapshot(path, header, arrays)
+
+
+def _concat(parts: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(parts).astype(dtype, copy=False) if parts else np.empty(0, dtype=dtype)
+
+
+if __name__ == "__main__":
+    from kpi_engine import SNAPSHOT_PATH, kpi_store
+
+    out = Path(sys.argv[1]) if len(sys.argv) > 1 else SNAPSHOT_PATH
+    started = time.perf_counter()
+    kpi_store.load(use_snapshot=False)
+    size = build_snapshot(kpi_store, out)
+    print(f"{out}: {size / 1e6:.1f} MB, {sum(len(s) for s in kpi_store.series.values())} rows "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from severity_index import SEVERITY_RANK
+
+# Fine grid used for the bbox lookup, in degrees.
+GRID_DEGREES = 0.05
+GRID_COLUMNS = int(round(360 / GRID_DEGREES))
+# Clusters are about a quarter of a 256px map tile wide at the request's zoom.
+CLUSTERS_PER_TILE = 4
+# At or above this zoom, or with this few sites in view, sites are returned as-is.
+CLUSTER_MAX_ZOOM = 14
+MAX_UNCLUSTERED = 500
+
+SEVERITY_NAMES = {rank: name for name, rank in SEVERITY_RANK.items()}
+UNKNOWN = -1
+
+BBox = Tuple[float, float, float, float]  # west, south, east, north
+
+
+def parse_bbox(value: str) -> BBox:
+    """Leaflet's ``toBBoxString()`` order: west,south,east,north.
+
+    Values are clamped to valid coordinates, since a wrapped or zoomed-out
+    map can report a viewport beyond them.
+    """
+    west, south, east, north = (float(part) for part in value.split(","))
+    if not all(math.isfinite(part) for part in (west, south, east, north)):
+        raise ValueError("bbox values must be finite numbers")
+    if west > east or south > north:
+        raise ValueError("bbox must be west,south,east,north")
+    west, east = (min(max(lng, -180.0), 180.0) for lng in (west, east))
+    south, north = (min(max(lat, -90.0), 90.0) for lat in (south, north))
+    return west, south, east, north
+
+
+class SiteGrid:
+    """Sites bucketed on a fixed lat/lng grid for viewport queries.
+
+    Sites are sorted by grid cell (row-major), so a bounding box is one
+    binary search per grid row it spans, followed by an exact filter.
+    Lower zooms are answered as clusters with the worst RCA severity and
+    per-severity counts of their sites.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.build([])
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def build(self, sites: Sequence[Dict[str, Any]]) -> None:
+        located = [site for site in sites if site.get("lat") is not None and site.get("lng") is not None]
+        lat = np.array([float(site["lat"]) for site in located], dtype=np.float64)
+        lng = np.array([float(site["lng"]) for site in located], dtype=np.float64)
+        keys = _cell_keys(lat, lng)
+        order = np.argsort(keys, kind="stable")
+        aliases: Dict[str, List[int]] = {}
+        for position, site in enumerate(located[i] for i in order):
+            for field in ("id", "geoId", "enodeb"):
+                if site.get(field) is not None:
+                    aliases.setdefault(str(site[field]), []).append(position)
+        with self._lock:
+            self._keys = keys[order]
+            self._lat = lat[order]
+            self._lng = lng[order]
+            self._records = [located[i] for i in order]
+            self._severity = np.full(len(located), UNKNOWN, dtype=np.int8)
+            self._aliases = aliases
+
+    def set_severity(self, site_id: Any, severity: Optional[str]) -> None:
+        """Record a site's current RCA severity; ``site_id`` may be id, geoId or eNodeB."""
+        rank = SEVERITY_RANK.get(severity, UNKNOWN)
+        for position in self._aliases.get(str(site_id), ()):
+            self._severity[position] = rank
+
+    def _in_bbox(self, bbox: BBox) -> np.ndarray:
+        west, south, east, north = bbox
+        rows = np.arange(_row(south), _row(north) + 1, dtype=np.int64)
+        lo = np.searchsorted(self._keys, rows * GRID_COLUMNS + _column(west), side="left")
+        hi = np.searchsorted(self._keys, rows * GRID_COLUMNS + _column(east), side="right")
+        lengths = hi - lo
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64)
+        # Concatenate the [lo, hi) ranges without a Python loop.
+        candidates = np.repeat(lo - np.r_[0, np.cumsum(lengths)[:-1]], lengths) + np.arange(lengths.sum())
+        lat, lng = self._lat[candidates], self._lng[candidates]
+        return candidates[(lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)]
+
+    def query(self, bbox: BBox, zoom: int) -> Dict[str, Any]:
+        """Sites in the viewport, clustered unless zoomed in or sparse."""
+        with self._lock:
+            hits = self._in_bbox(bbox)
+            if zoom >= CLUSTER_MAX_ZOOM or len(hits) <= MAX_UNCLUSTERED:
+                return {
+                    "total": int(len(hits)),
+                    "clustered": False,
+                    "clusters": [],
+                    "sites": [self._site(position) for position in hits.tolist()],
+                }
+            return {
+                "total": int(len(hits)),
+                "clustered": True,
+                "clusters": self._clusters(hits, zoom),
+                "sites": [],
+            }
+
+    def _site(self, position: int) -> Dict[str, Any]:
+        site = dict(self._records[position])
+        site["rca_severity"] = SEVERITY_NAMES.get(int(self._severity[position]))
+        return site
+
+    def _clusters(self, hits: np.ndarray, zoom: int) -> List[Dict[str, Any]]:
+        size = 360.0 / (2 ** max(zoom, 0)) / CLUSTERS_PER_TILE
+        lat, lng, severity = self._lat[hits], self._lng[hits], self._severity[hits]
+        keys = np.floor((lat + 90) / size).astype(np.int64) * (int(360 / size) + 1) + np.floor((lng + 180) / size).astype(np.int64)
+        cells, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.ravel()
+        count = np.bincount(inverse, minlength=len(cells))
+        lat_mean = np.bincount(inverse, weights=lat, minlength=len(cells)) / count
+        lng_mean = np.bincount(inverse, weights=lng, minlength=len(cells)) / count
+        worst = np.full(len(cells), UNKNOWN, dtype=np.int8)
+        np.maximum.at(worst, inverse, severity)
+        # Columns: unknown, minor, major, critical.
+        by_severity = np.bincount(inverse * 4 + (severity.astype(np.int64) + 1), minlength=4 * len(cells)).reshape(-1, 4)
+        return [
+            {
+                "lat": round(float(lat_mean[i]), 6),
+                "lng": round(float(lng_mean[i]), 6),
+                "count": int(count[i]),
+                "worst_severity": SEVERITY_NAMES.get(int(worst[i])),
+                "severity_counts": {
+                    "critical": int(by_severity[i, 3]),
+                    "major": int(by_severity[i, 2]),
+                    "minor": int(by_severity[i, 1]),
+                    "unknown": int(by_severity[i, 0]),
+                },
+            }
+            for i in range(len(cells))
+        ]
+
+
+def _row(lat) -> np.ndarray:
+    return np.clip(np.floor((np.asarray(lat) + 90) / GRID_DEGREES), 0, int(180 / GRID_DEGREES)).astype(np.int64)
+
+
+def _column(lng) -> np.ndarray:
+    return np.clip(np.floor((np.asarray(lng) + 180) / GRID_DEGREES), 0, GRID_COLUMNS - 1).astype(np.int64)
+
+
+def _cell_keys(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    return _row(lat) * GRID_COLUMNS + _column(lng)
+
+
+site_grid = SiteGrid()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+
+from flask import Response, stream_with_context
+
+
+class Subscription:
+    """One dashboard's pending updates, coalesced by key.
+
+    A newer event for the same key replaces the pending one, so a burst of
+    samples for one series becomes a single message. If more than
+    ``max_pending`` distinct keys pile up (a slow client), the buffer is
+    dropped and the client is told to resync instead.
+    """
+
+    def __init__(self, filters: Dict[str, str], max_pending: int):
+        self.filters = filters
+        self.max_pending = max_pending
+        self.pending: Dict[Hashable, Dict[str, Any]] = {}
+        self.overflowed = False
+        self.cond = threading.Condition()
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return all(event.get(field) in (None, value) for field, value in self.filters.items())
+
+    def offer(self, key: Hashable, event: Dict[str, Any]) -> None:
+        with self.cond:
+            if self.overflowed:
+                return
+            self.pending[key] = event
+            if len(self.pending) > self.max_pending:
+                self.pending.clear()
+                self.overflowed = True
+            self.cond.notify()
+
+    def drain(self, timeout: float) -> Optional[Dict[str, Any]]:
+        with self.cond:
+            if not self.pending and not self.overflowed:
+                self.cond.wait(timeout)
+            if self.overflowed:
+                self.overflowed = False
+                return {"resync": True, "updates": []}
+            if not self.pending:
+                return None
+            updates, self.pending = list(self.pending.values()), {}
+            return {"resync": False, "updates": updates}
+
+
+class UpdateBroker:
+    """Fans coalesced KPI/RCA updates out to Server-Sent Events subscribers."""
+
+    def __init__(self, flush_interval: float = 0.5, heartbeat: float = 15.0, max_pending: int = 5000):
+        self.flush_interval = flush_interval
+        self.heartbeat = heartbeat
+        self.max_pending = max_pending
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, key: Hashable, event: Dict[str, Any]) -> None:
+        for subscription in self._subscribers:
+            if subscription.matches(event):
+                subscription.offer(key, event)
+
+    def subscribe(self, filters: Dict[str, str]) -> Subscription:
+        subscription = Subscription(filters, self.max_pending)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def _events(self, subscription: Subscription) -> Iterator[str]:
+        try:
+            yield "retry: 3000\n\n"
+            last_message = time.monotonic()
+            while True:
+                batch = subscription.drain(self.heartbeat)
+                if batch is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {'resync' if batch['resync'] else 'kpi-update'}\ndata: {json.dumps(batch)}\n\n"
+                # At most one message per flush interval; later updates keep coalescing.
+                wait = self.flush_interval - (time.monotonic() - last_message)
+                if wait > 0:
+                    time.sleep(wait)
+                last_message = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
+
+    def stream(self, filters: Dict[str, str]) -> Response:
+        subscription = self.subscribe(filters)
+        return Response(
+            stream_with_context(self._events(subscription)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+broker = UpdateBroker()
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import correlation
+from rollups import RollupIndex
+
+START = 1_717_200_000  # 2024-06-01 00:00 UTC
+
+
+@pytest.fixture
+def store(monkeypatch):
+    rng = np.random.default_rng(3)
+    hours = np.arange(24 * 6)
+    cqi = rng.normal(10, 2, len(hours))
+    latency = 80 - 3 * cqi + rng.normal(0, 2, len(hours))
+    # Latency is missing for some hours; pairs only use hours where both exist.
+    present = rng.random(len(hours)) > 0.2
+
+    rollups = RollupIndex()
+    rollups.add("CQI", "Dallas", ["S1"] * len(hours), START + hours * 3600, cqi)
+    rollups.add("Latency", "Dallas", ["S1"] * present.sum(), START + hours[present] * 3600, latency[present])
+    fake = SimpleNamespace(
+        series={("CQI", "Dallas"): None, ("Latency", "Dallas"): None},
+        rollups=rollups,
+        latest=np.datetime64(START + int(hours[-1]) * 3600, "s"),
+        maybe_reload=lambda: None,
+    )
+    monkeypatch.setattr(correlation, "kpi_store", fake)
+    correlation.moment_cache.clear()
+    yield SimpleNamespace(cqi=cqi, latency=latency, present=present)
+    correlation.moment_cache.clear()
+
+
+def test_matches_numpy_corrcoef_on_shared_buckets(store):
+    expected = np.corrcoef(store.cqi[store.present], store.latency[store.present])[0, 1]
+
+    result = correlation.get_correlation(market="dallas", time="2024-06-01 to 2024-06-07", resolution="hour")
+
+    assert result["kpis"] == ["CQI", "Latency"]
+    assert result["matrix"][0][1] == pytest.approx(expected, abs=1e-4)
+    assert result["matrix"][0][0] == pytest.approx(1.0)
+    assert result["samples"][0][1] == store.present.sum()
+
+
+def test_cached_days_and_partial_edge_days_combine(store):
+    # Warm the per-day cache, then ask for a window that starts mid-day:
+    # 2024-06-05 18:00 up to the end of the data.
+    correlation.get_correlation(market="Dallas", time="2024-06-01 to 2024-06-07", resolution="hour")
+    hits = correlation.moment_cache.hits
+    window = np.zeros(len(store.cqi), dtype=bool)
+    window[114:] = True
+    window &= store.present
+    expected = np.corrcoef(store.cqi[window], store.latency[window])[0, 1]
+
+    result = correlation.get_correlation(market="Dallas", time="last 30 hours")
+
+    assert result["window"] == {"start": "2024-06-05 18:00:00", "end": "2024-06-07 00:00:00"}
+    assert result["matrix"][0][1] == pytest.approx(expected, abs=1e-4)
+    assert correlation.moment_cache.hits > hits
+
+
+def test_too_few_shared_samples_is_null(store):
+    result = correlation.get_correlation(market="Dallas", time="2024-06-01", resolution="day")
+
+    assert result["matrix"][0][1] is None
@@ -0,0 +1,90 @@
+import gzip
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app import app
+from encoding import SERIES_MIMETYPE, Series, arrow_chunks, pack_chunks, unpack
+
+SERIES_CODEC = Path(__file__).resolve().parents[2] / "src" / "utils" / "seriesCodec.js"
+META = {"reply": "ok", "charts": [{"type": "line"}]}
+
+
+@pytest.fixture
+def series():
+    start = 1_717_200_000
+    return [
+        Series("CQI", start + np.arange(48, dtype=np.int64) * 3600, np.linspace(1, 15, 48), 3600),
+        Series("Latency", np.array([start, start + 2 * 86400], dtype=np.int64), np.array([80.5, 61.25]), 86400),
+        Series("Empty", np.empty(0, dtype=np.int64), np.empty(0), 86400),
+    ]
+
+
+def test_packed_round_trip(series):
+    decoded = unpack(b"".join(pack_chunks(META, series)))
+
+    assert decoded["reply"] == "ok"
+    assert [d["name"] for d in decoded["series"]] == ["CQI", "Latency", "Empty"]
+    for descriptor, s in zip(decoded["series"], series):
+        np.testing.assert_array_equal(descriptor["timestamps"], s.timestamps)
+        np.testing.assert_array_equal(descriptor["values"], s.values.astype(np.float32))
+
+
+def test_packed_prompt_query_matches_json():
+    client = app.test_client()
+    prompt = {"prompt": "cqi in dallas from 2024-06-24 to 2024-06-29"}
+
+    as_json = client.post("/assistant/prompt-query", json=prompt).get_json()
+    response = client.post(
+        "/assistant/prompt-query", json=prompt, headers={"Accept": SERIES_MIMETYPE, "Accept-Encoding": "gzip"}
+    )
+
+    assert response.mimetype == SERIES_MIMETYPE
+    assert response.headers["Content-Encoding"] == "gzip"
+    decoded = unpack(gzip.decompress(response.get_data()))
+    assert decoded["reply"] == as_json["reply"]
+    assert "data" not in decoded["charts"][0]
+    np.testing.assert_allclose(decoded["series"][0]["values"], as_json["charts"][0]["data"], rtol=1e-6)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_series_codec_decodes_packed_body(series, tmp_path):
+    body = tmp_path / "body.bin"
+    body.write_bytes(b"".join(pack_chunks(META, series)))
+    script = f"""
+        import {{ readFileSync }} from 'node:fs';
+        import {{ decodeSeries }} from '{SERIES_CODEC.as_uri()}';
+        const bytes = readFileSync('{body}');
+        const header = decodeSeries(bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.length));
+        console.log(JSON.stringify(header.series.map((s) => ({{
+          name: s.name,
+          timestamps: Array.from(s.deltas, (_, i) => s.timestamp(i)),
+          values: Array.from(s.values),
+        }}))));
+    """
+    result = subprocess.run(
+        ["node", "--no-warnings", "--input-type=module", "-e", script], capture_output=True, text=True, check=True
+    )
+
+    decoded = json.loads(result.stdout)
+    assert [d["name"] for d in decoded] == ["CQI", "Latency", "Empty"]
+    for descriptor, s in zip(decoded, series):
+        assert descriptor["timestamps"] == s.timestamps.tolist()
+        np.testing.assert_array_equal(np.float32(descriptor["values"]), s.values.astype(np.float32))
+
+
+def test_arrow_round_trip(series):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    reader = pyarrow.ipc.open_stream(b"".join(arrow_chunks(META, series)))
+    batches = list(reader)
+
+    assert json.loads(reader.schema.metadata[b"meta"])["series"] == ["CQI", "Latency", "Empty"]
+    for batch, s in zip(batches, series):
+        np.testing.assert_array_equal(batch.column(0).cast(pyarrow.int64()).to_numpy(), s.timestamps)
+        np.testing.assert_array_equal(batch.column(1).to_numpy(), s.values.astype(np.float32))
@@ -0,0 +1,64 @@
+import os
+
+from forecast_store import ForecastStore
+
+
+def _write(path, rows):
+    path.write_text("_DAY,ENODEB,anomaly_score\n" + "".join(f"{day},{enodeb},{score}\n" for day, enodeb, score in rows))
+
+
+def _count(store):
+    return store.pool.connection().execute("SELECT COUNT(*) FROM forecast_scores").fetchone()[0]
+
+
+def test_unchanged_file_is_skipped(tmp_path):
+    csv_path = tmp_path / "forecast.csv"
+    _write(csv_path, [("2025-01-01", 1, -0.5), ("2025-01-02", 1, -0.1)])
+    store = ForecastStore(tmp_path / "forecast.db")
+
+    assert store.ingest(csv_path) == 2
+    assert store.ingest(csv_path) == 0
+    assert _count(store) == 2
+
+
+def test_changed_file_replaces_its_rows(tmp_path):
+    csv_path = tmp_path / "forecast.csv"
+    _write(csv_path, [("2025-01-01", 1, -0.5), ("2025-01-02", 1, -0.1)])
+    store = ForecastStore(tmp_path / "forecast.db")
+    store.ingest(csv_path)
+
+    # Touched only: same rows again.
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert store.ingest(csv_path) == 2
+    assert _count(store) == 2
+    assert store.query(1) == [
+        {"_DAY": "2025-01-01", "anomaly_score": -0.5},
+        {"_DAY": "2025-01-02", "anomaly_score": -0.1},
+    ]
+    assert store.query(1, top=2) == [
+        {"_DAY": "2025-01-01", "anomaly_score": -0.5},
+        {"_DAY": "2025-01-02", "anomaly_score": -0.1},
+    ]
+
+    # Rewritten with different rows.
+    _write(csv_path, [("2025-01-03", 1, -0.9)])
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+    assert store.ingest(csv_path) == 1
+    assert store.query(1) == [{"_DAY": "2025-01-03", "anomaly_score": -0.9}]
+
+    assert store.ingest(csv_path, force=True) == 1
+    assert _count(store) == 1
+
+
+def test_files_are_replaced_independently(tmp_path):
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    _write(first, [("2025-01-01", 1, -0.5)])
+    _write(second, [("2025-01-01", 2, -0.2)])
+    store = ForecastStore(tmp_path / "forecast.db")
+    store.ingest(first)
+    store.ingest(second)
+
+    store.ingest(first, force=True)
+    assert store.query(1) == [{"_DAY": "2025-01-01", "anomaly_score": -0.5}]
+    assert store.query(2) == [{"_DAY": "2025-01-01", "anomaly_score": -0.2}]
@@ -0,0 +1,19 @@
+from hierarchy import NetworkHierarchy
+
+
+def test_sector_fields_aggregate_under_kpi_names():
+    hierarchy = NetworkHierarchy()
+    hierarchy.set_topology(
+        [{"name": "Dallas", "sites": [{"id": "DAL001", "enbs": ["100"]}]}],
+        {"100": {"sectors": [
+            {"id": "1", "kpis": {"cqi": 10, "drops": 0.5, "prbUtil": 70}},
+            {"id": "2", "kpis": {"cqi": 6, "drops": 1.5, "prbUtil": 90}},
+        ]}},
+        [{"id": 1, "state": "Dallas", "geoId": "DAL001", "kpi": "CQI", "value": 2}],
+    )
+    hierarchy.rebuild()
+
+    kpis = hierarchy.get(["Dallas", "DAL001"])["kpis"]
+    assert set(kpis) == {"CQI", "Bearer Drop Rate", "PRB Utilization (%)"}
+    assert kpis["CQI"] == {"count": 3, "mean": 6.0, "min": 2.0, "max": 10.0}
+    assert kpis["Bearer Drop Rate"]["mean"] == 1.0
@@ -0,0 +1,60 @@
+import pytest
+
+from app import app
+from ingest import parse_samples
+from kpi_engine import kpi_store
+
+
+@pytest.fixture
+def client():
+    app.config["REALTIME_INGEST"] = True
+    return app.test_client()
+
+
+def test_parse_samples_drops_invalid_rows():
+    df = parse_samples([
+        {"kpi": "CQI", "geo": "Testville", "site_id": "T1", "timestamp": "2025-06-09T01:00:00Z", "value": "7.5"},
+        {"kpi": "CQI", "geo": "Testville", "timestamp": "2025-06-09T02:00:00", "value": 8},
+        {"kpi": "CQI", "geo": "Testville", "site_id": "T1", "timestamp": "not a date", "value": 1},
+        {"kpi": "CQI", "site_id": "T1", "timestamp": "2025-06-09T03:00:00", "value": 1},
+        1,
+        "CQI",
+    ])
+
+    assert df["value"].tolist() == [7.5, 8.0]
+    assert df["site_id"].tolist() == ["T1", ""]
+    assert str(df["date"].iloc[0]) == "2025-06-09 01:00:00"
+
+
+def test_ingest_appends_to_store(client):
+    response = client.post("/kpi/ingest", json={"samples": [
+        {"kpi": "CQI", "geo": "Ingestville", "site_id": "I1", "timestamp": "2025-06-09T01:00:00", "value": 6},
+        {"kpi": "CQI", "geo": "Ingestville", "site_id": "I2", "timestamp": "2025-06-09T02:00:00", "value": 9},
+        {"kpi": "CQI", "geo": "Ingestville"},
+    ]})
+
+    assert response.status_code == 200
+    assert response.get_json()["accepted"] == 2
+    assert response.get_json()["rejected"] == 1
+    assert kpi_store.get("CQI", "Ingestville").values.tolist() == [6.0, 9.0]
+
+
+def test_ingest_rejects_non_object_samples(client):
+    response = client.post("/kpi/ingest", json=[1, 2])
+
+    assert response.status_code == 200
+    assert response.get_json()["accepted"] == 0
+    assert response.get_json()["rejected"] == 2
+
+
+def test_ingest_requires_a_list(client):
+    assert client.post("/kpi/ingest", json={"samples": {}}).status_code == 400
+    assert client.post("/kpi/ingest", json=[]).status_code == 400
+
+
+def test_ingest_disabled_without_realtime_mode(client):
+    app.config["REALTIME_INGEST"] = False
+    try:
+        assert client.post("/kpi/ingest", json=[{"kpi": "CQI"}]).status_code == 503
+    finally:
+        app.config["REALTIME_INGEST"] = True
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from app import app
+from intent_parser import IntentMatcher, extract_intent
+
+
+@pytest.fixture
+def matcher(tmp_path):
+    vocab = tmp_path / "vocab.json"
+    vocab.write_text(json.dumps({
+        "kpis": {"Throughput": ["tput"], "DL Throughput (Mbps)": ["dl throughput", "downlink throughput"]},
+        "markets": {"St Louis": ["st louis", "saint louis"], "Louisville": []},
+    }))
+    return IntentMatcher(vocab)
+
+
+def _values(matches):
+    return [(category, value) for _, _, category, value in matches]
+
+
+def test_market_aliases_resolve_to_site_market_names():
+    for prompt in ("cqi in oklahoma", "cqi in Oklahoma City", "cqi in okc"):
+        assert extract_intent(prompt)["geo"] == "Oklahoma City"
+
+
+def test_prompt_site_narrows_chart_to_that_site():
+    client = app.test_client()
+    window = "from 2024-06-24 to 2024-06-29"
+
+    market = client.post("/assistant/prompt-query", json={"prompt": f"cqi in okc {window}"}).get_json()
+    site = client.post("/assistant/prompt-query", json={"prompt": f"cqi at 53100 in okc {window}"}).get_json()
+    other = client.post("/assistant/prompt-query", json={"prompt": f"cqi at 43123 in okc {window}"}).get_json()
+
+    assert market["charts"][0]["data"] == [3.8, 3.6, 3.4, 3.5, 3.2]
+    assert site["reply"].startswith("CQI in Oklahoma City site 53100 averages")
+    assert site["charts"][0]["data"] == [3.8, 3.6, 3.4, 3.5, 3.2]
+    assert other["charts"][0]["data"] == []
+
+
+def test_longest_multi_word_alias_wins(matcher):
+    matches = matcher.match("dl throughput vs throughput in saint louis")
+
+    assert _values(matches) == [
+        ("kpi", "DL Throughput (Mbps)"), ("kpi", "Throughput"), ("market", "St Louis"),
+    ]
+    assert matches[0][:2] == (0, 13)
+
+
+def test_aliases_match_whole_words_only(matcher):
+    assert _values(matcher.match("louisville tputs")) == [("market", "Louisville")]
+
+
+def test_delta_and_rebuilt_automata_agree(matcher):
+    text = "downlink throughput at site ab12 and ab123"
+    matcher.add_many("site", [("ab12", ()), ("ab123", ())])
+    before = matcher.match(text)
+
+    matcher._rebuild()
+
+    assert matcher.match(text) == before
+    assert _values(before) == [("kpi", "DL Throughput (Mbps)"), ("site", "ab12"), ("site", "ab123")]
+
+
+def test_registered_aliases_keep_their_first_meaning(matcher):
+    matcher.add("market", "Saint Louis Metro", ["saint louis"])
+
+    assert _values(matcher.match("saint louis")) == [("market", "St Louis")]
+    assert _values(matcher.match("saint louis metro")) == [("market", "Saint Louis Metro")]
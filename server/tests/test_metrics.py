@@ -0,0 +1,14 @@
+from metrics import SlowRequestLog
+
+
+def test_one_profiler_at_a_time():
+    log = SlowRequestLog(size=5, sample_rate=1.0)
+    first = log.start_profile()
+
+    assert first is not None
+    assert log.start_profile() is None
+
+    log.stop_profile(first)
+    second = log.start_profile()
+    assert second is not None
+    log.stop_profile(second)
@@ -0,0 +1,32 @@
+from offenders import OffenderIndex
+
+
+def test_older_sample_does_not_replace_latest():
+    index = OffenderIndex()
+    index.update("CQI", "Dallas", "S1", 9.0, "2025-06-08 02:00:00")
+    index.update("CQI", "Dallas", "S1", 2.0, "2025-06-08 01:00:00")
+
+    assert [(row["value"], row["updated_at"]) for row in index.top("CQI", "Dallas")] == [(9.0, "2025-06-08 02:00:00")]
+
+    index.update("CQI", "Dallas", "S1", 3.0, "2025-06-08 03:00:00")
+    assert index.top("CQI", "Dallas")[0]["value"] == 3.0
+
+
+def test_higher_is_better_kpi_ranks_lowest_first():
+    index = OffenderIndex()
+    index.update_many([
+        ("Throughput", "Dallas", "A", 5.0, None),
+        ("Throughput", "Dallas", "B", 300.0, None),
+        ("Throughput", "Dallas", "C", 150.0, None),
+    ])
+
+    assert [row["site_id"] for row in index.top("Throughput", "Dallas", n=2)] == ["A", "C"]
+
+
+def test_direction_is_read_at_query_time(monkeypatch):
+    index = OffenderIndex()
+    index.update_many([("Latency", "Dallas", "A", 20.0, None), ("Latency", "Dallas", "B", 90.0, None)])
+    assert index.top("Latency", "Dallas", n=1)[0]["site_id"] == "B"
+
+    monkeypatch.setattr("offenders.lower_is_worse", lambda kpi: True)
+    assert index.top("Latency", "Dallas", n=1)[0]["site_id"] == "A"
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from rca_engine import NetworkRCAEngine
+from rca_rules import confidence_score
+
+
+def _cause(name, probability):
+    return {"cause": name, "probability": probability, "next_actions": ["Check RF conditions"]}
+
+
+RULES = {
+    "RSRP (dBm)": {
+        "thresholds": {"critical": -115, "major": -105},
+        "reverse_logic": True,
+        "impact": {"critical": "No coverage", "major": "Weak coverage", "minor": "OK"},
+        "root_causes": {"high": [_cause("Coverage Gap", 0.35), _cause("Poor Radio Conditions", 0.3)]},
+    },
+    "Bearer Drop Rate": {
+        "thresholds": {"critical": 5, "major": 2},
+        "impact": {"critical": "Frequent drops", "major": "Some drops", "minor": "OK"},
+        "root_causes": {"high": [_cause("Handover Failures", 0.4), _cause("Poor Radio Conditions", 0.3)]},
+    },
+}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES))
+    return NetworkRCAEngine(path)
+
+
+def test_shared_cause_combines_across_kpis(engine):
+    analysis = engine.analyze_site({"id": "S1", "sectorInfo": [
+        {"id": "1", "kpis": {"RSRP (dBm)": -125, "Bearer Drop Rate": 6}},
+    ]})
+    causes = {cause["cause"]: cause for cause in analysis["root_causes"]}
+    radio = causes["Poor Radio Conditions"]
+
+    assert sorted(radio["supporting_kpis"]) == ["Bearer Drop Rate", "RSRP (dBm)"]
+    # 1 - (1 - 0.3) * (1 - 0.3)
+    assert radio["probability"] == 0.51
+    assert radio["confidence_score"] == confidence_score(0.51)
+    assert analysis["root_causes"][0]["cause"] == "Poor Radio Conditions"
+    assert causes["Handover Failures"]["probability"] == 0.4
+
+
+def test_site_wide_row_does_not_add_users(engine):
+    sector = {"id": "1", "kpis": {"Bearer Drop Rate": 6}}
+    with_site_row = engine.analyze_site({"id": "S1", "kpi": "Bearer Drop Rate", "value": 6, "sectorInfo": [sector]})
+    sectors_only = engine.analyze_site({"id": "S1", "sectorInfo": [sector]})
+    site_only = engine.analyze_site({"id": "S1", "kpi": "Bearer Drop Rate", "value": 6})
+
+    assert with_site_row["estimated_users_affected"] == sectors_only["estimated_users_affected"] == 800
+    assert site_only["estimated_users_affected"] == 800
+
+
+def test_next_best_action_revalidates_with_etag():
+    from app import app
+
+    client = app.test_client()
+    site = {"id": "S1", "kpi": "Bearer Drop Rate", "value": 6}
+
+    first = client.post("/recommendations/next-best-action", json={"site": site})
+    etag = first.headers["ETag"]
+    again = client.post("/recommendations/next-best-action", json={"site": site}, headers={"If-None-Match": etag})
+    changed = client.post(
+        "/recommendations/next-best-action", json={"site": {**site, "value": 1}}, headers={"If-None-Match": etag}
+    )
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.get_data() == b""
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_etag_changes_when_rules_are_reloaded(tmp_path, monkeypatch):
+    import rca_engine
+
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES))
+    engine = NetworkRCAEngine(path, check_interval=0)
+    monkeypatch.setattr(rca_engine, "rca_engine", engine)
+    site = {"id": "S1", "kpi": "Bearer Drop Rate", "value": 6}
+    before = rca_engine.analysis_etag(site)
+
+    assert rca_engine.analysis_etag(site) == before
+    edited = json.loads(json.dumps(RULES))
+    edited["Bearer Drop Rate"]["root_causes"]["high"][0]["probability"] = 0.45
+    path.write_text(json.dumps(edited, indent=2))
+
+    assert rca_engine.analysis_etag(site) != before
+    assert engine.rca_rules["Bearer Drop Rate"].causes_for("critical")[0].probability == 0.45
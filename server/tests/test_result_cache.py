@@ -0,0 +1,46 @@
+from result_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_discard_where_drops_matching_keys():
+    cache = TTLCache(maxsize=8, ttl=60, clock=FakeClock())
+    cache.set((("CQI", "Dallas"),), 1)
+    cache.set((("CQI", "Tampa"),), 2)
+
+    assert cache.discard_where(lambda key: ("CQI", "Dallas") in key) == 1
+    assert cache.get((("CQI", "Dallas"),)) is None
+    assert cache.get((("CQI", "Tampa"),)) == 2
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import RESOLUTIONS, RollupIndex
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(7)
+    n = 2000
+    return pd.DataFrame({
+        "site": rng.choice(["S1", "S2", "S3"], n),
+        "seconds": rng.integers(1_700_000_000, 1_700_000_000 + 10 * 86400, n),
+        "value": rng.normal(10, 3, n).round(2),
+    })
+
+
+def _expected(df, width, site=None):
+    if site is not None:
+        df = df[df["site"] == site]
+    grouped = df.groupby(df["seconds"] // width)["value"].agg(["count", "sum"])
+    return grouped.index.to_numpy(), grouped["count"].to_numpy(), grouped["sum"].to_numpy()
+
+
+def _assert_buckets(actual, expected):
+    ids, counts, sums = actual
+    np.testing.assert_array_equal(ids, expected[0])
+    np.testing.assert_array_equal(counts, expected[1])
+    np.testing.assert_allclose(sums, expected[2])
+
+
+def test_rollups_match_pandas_groupby(samples):
+    index = RollupIndex()
+    # Two overlapping batches exercise the out-of-order merge path.
+    for batch in (samples.iloc[::2], samples.iloc[1::2]):
+        index.add("CQI", "Dallas", batch["site"].tolist(), batch["seconds"].to_numpy(), batch["value"].to_numpy())
+
+    for resolution, width in RESOLUTIONS.items():
+        _assert_buckets(index.buckets("CQI", "Dallas", resolution=resolution), _expected(samples, width))
+        for site in ("S1", "S2", "S3"):
+            _assert_buckets(
+                index.buckets("CQI", "Dallas", site=site, resolution=resolution), _expected(samples, width, site)
+            )
+
+
+def test_bucket_range_is_half_open(samples):
+    index = RollupIndex()
+    index.add("CQI", "Dallas", samples["site"].tolist(), samples["seconds"].to_numpy(), samples["value"].to_numpy())
+    ids, _, _ = index.buckets("CQI", "Dallas")
+
+    window, _, _ = index.buckets("CQI", "Dallas", start=ids[2], end=ids[5])
+
+    assert window.tolist() == ids[2:5].tolist()
+
+
+def test_packed_export_round_trips(samples):
+    index = RollupIndex()
+    index.add("CQI", "Dallas", samples["site"].tolist(), samples["seconds"].to_numpy(), samples["value"].to_numpy())
+    series_codes = {("CQI", "Dallas"): 0}
+    site_codes = {"S1": 0, "S2": 1, "S3": 2}
+
+    packed = RollupIndex.from_packed(index.export(series_codes, site_codes), series_codes, site_codes)
+
+    for resolution in RESOLUTIONS:
+        for site in (None, "S1", "S2", "S3"):
+            expected = index.buckets("CQI", "Dallas", site=site, resolution=resolution)
+            _assert_buckets(packed.buckets("CQI", "Dallas", site=site, resolution=resolution), expected)
+    assert len(packed.buckets("CQI", "Dallas", site="S4")[0]) == 0
@@ -0,0 +1,15 @@
+from severity_index import SeverityIndex, SiteSeverity
+
+
+def test_aliased_ids_count_as_one_site():
+    index = SeverityIndex()
+    index.set_aliases({"DAL001": "1"})
+    index.record("1", SiteSeverity("critical", "Dallas", False, 0.8, "1-2 hours", kpi="RSRP (dBm)"))
+    index.record("2", SiteSeverity("major", "Dallas", True, 0.6, None, kpi="CQI"))
+
+    summary = index.summarize_sites([1, 2, 3, "DAL001"])
+
+    assert summary["total_sites"] == 3
+    assert summary["analyzed_sites"] == 2
+    assert summary["critical_issues"] == 1
+    assert summary["major_issues"] == 1
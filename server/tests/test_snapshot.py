@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from kpi_db import KPIDatabase
+from kpi_store import KPIStore
+from snapshot import build_snapshot
+
+CSV = """kpi,geo,date,site_id,value
+CQI,Dallas,2024-06-24,43123,3.5
+CQI,Dallas,2024-06-25,43123,3.2
+"""
+
+
+@pytest.fixture
+def paths(tmp_path):
+    csv = tmp_path / "kpi.csv"
+    csv.write_text(CSV)
+    snapshot = tmp_path / "kpi.snapshot"
+    store = KPIStore(csv, KPIDatabase(tmp_path / "kpi.db"))
+    store.load()
+    build_snapshot(store, snapshot)
+    return csv, snapshot, tmp_path / "kpi.db"
+
+
+def _load(csv, snapshot, db, monkeypatch):
+    """A freshly loaded store and whether it parsed the source."""
+    store = KPIStore(csv, KPIDatabase(db), snapshot_path=snapshot)
+    parsed = []
+    read_source = store._read_source
+    monkeypatch.setattr(store, "_read_source", lambda source: parsed.append(source) or read_source(source))
+    store.load()
+    return store, bool(parsed)
+
+
+def test_matching_snapshot_is_mapped_instead_of_parsed(paths, monkeypatch):
+    store, parsed = _load(*paths, monkeypatch)
+
+    assert not parsed
+    assert store.get("CQI", "Dallas").values.tolist() == [3.5, 3.2]
+    assert store.rollups.buckets("CQI", "Dallas", site="43123")[2].tolist() == [3.5, 3.2]
+
+
+def test_stale_snapshot_signature_rebuilds_from_source(paths, monkeypatch):
+    csv, snapshot, db = paths
+    # Same size, new content and mtime: only the signature tells them apart.
+    stat = os.stat(csv)
+    csv.write_text(CSV.replace("3.2", "4.2"))
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    store, parsed = _load(csv, snapshot, db, monkeypatch)
+
+    assert parsed
+    assert store.get("CQI", "Dallas").values.tolist() == [3.5, 4.2]
+
+
+def test_corrupt_snapshot_falls_back_to_parsing(paths, monkeypatch):
+    csv, snapshot, db = paths
+    snapshot.write_bytes(b"not a snapshot" + b"\0" * 64)
+
+    store, parsed = _load(csv, snapshot, db, monkeypatch)
+
+    assert parsed
+    assert store.get("CQI", "Dallas").values.tolist() == [3.5, 3.2]
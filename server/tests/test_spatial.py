@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from spatial import CLUSTER_MAX_ZOOM, MAX_UNCLUSTERED, SiteGrid, parse_bbox
+
+
+@pytest.fixture
+def sites():
+    rng = np.random.default_rng(11)
+    return [
+        {"id": f"S{i}", "lat": float(lat), "lng": float(lng)}
+        for i, (lat, lng) in enumerate(zip(rng.uniform(32, 36, 2000), rng.uniform(-98, -95, 2000)))
+    ]
+
+
+def test_parse_bbox_clamps_to_valid_coordinates():
+    assert parse_bbox("-200,-95.5,190,100") == (-180.0, -90.0, 180.0, 90.0)
+    assert parse_bbox("-97.1,32.5,-96.5,33") == (-97.1, 32.5, -96.5, 33.0)
+
+
+@pytest.mark.parametrize("value", ["nan,0,1,1", "0,0,inf,1", "-inf,0,1,1", "1,0,0,1", "0,1,1,0", "0,0,1", "a,b,c,d"])
+def test_parse_bbox_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_bbox_query_matches_brute_force(sites):
+    grid = SiteGrid()
+    grid.build(sites)
+    bbox = (-97.2, 33.1, -96.4, 34.02)
+
+    result = grid.query(bbox, CLUSTER_MAX_ZOOM)
+
+    west, south, east, north = bbox
+    expected = {s["id"] for s in sites if west <= s["lng"] <= east and south <= s["lat"] <= north}
+    assert result["clustered"] is False
+    assert {s["id"] for s in result["sites"]} == expected
+    assert result["total"] == len(expected)
+
+
+def test_clusters_below_max_zoom_when_dense(sites):
+    grid = SiteGrid()
+    grid.build(sites)
+    grid.set_severity("S0", "critical")
+    everywhere = parse_bbox("-180,-90,180,90")
+
+    clustered = grid.query(everywhere, CLUSTER_MAX_ZOOM - 1)
+    zoomed_in = grid.query(everywhere, CLUSTER_MAX_ZOOM)
+
+    assert clustered["clustered"] is True and clustered["sites"] == []
+    assert sum(c["count"] for c in clustered["clusters"]) == len(sites)
+    assert sum(c["severity_counts"]["critical"] for c in clustered["clusters"]) == 1
+    assert [c["worst_severity"] for c in clustered["clusters"]].count("critical") == 1
+    assert zoomed_in["clustered"] is False and len(zoomed_in["sites"]) == len(sites)
+
+
+def test_sparse_viewports_are_not_clustered(sites):
+    grid = SiteGrid()
+    grid.build(sites[:MAX_UNCLUSTERED])
+
+    result = grid.query(parse_bbox("-180,-90,180,90"), 3)
+
+    assert result["clustered"] is False
+    assert len(result["sites"]) == MAX_UNCLUSTERED
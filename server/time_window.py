@@ -0,0 +1,50 @@
+from __future__ import annotations
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+
+DAY = np.timedelta64(1, "D")
+HOUR = np.timedelta64(1, "h")
+
+LAST_N = re.compile(r"last (\d+) (hour|day)s?$")
+DATE_RANGE = re.compile(r"(\d{4}-\d{2}-\d{2})(?: to (\d{4}-\d{2}-\d{2}))?$")
+
+# (start, end) as datetime64[s] with ``end`` exclusive, plus the chart resolution.
+Window = Tuple[Optional[np.datetime64], Optional[np.datetime64], str]
+
+
+def resolve_window(label: str, now: Optional[np.datetime64]) -> Window:
+    """Turn an intent time label into a concrete window ending at ``now``.
+
+    Labels are those produced by ``intent_parser``: today, yesterday, this
+    week, ``last N days``, ``last N hours``, ``YYYY-MM-DD`` and
+    ``YYYY-MM-DD to YYYY-MM-DD``. ``now`` is the latest timestamp in the
+    data rather than the wall clock, so relative windows stay meaningful
+    for historical datasets. Unknown labels cover the full history.
+    """
+    if now is None:
+        return None, None, "day"
+    today = now.astype("datetime64[D]")
+    label = (label or "").strip().lower()
+    last_n, date_range = LAST_N.match(label), DATE_RANGE.match(label)
+    if label == "today":
+        start, end, resolution = today, today + DAY, "hour"
+    elif label == "yesterday":
+        start, end, resolution = today - DAY, today, "hour"
+    elif label == "this week":
+        # datetime64 day 0 (1970-01-01) was a Thursday.
+        weekday = (today.astype(np.int64) + 3) % 7
+        start, end, resolution = today - weekday * DAY, today + DAY, "day"
+    elif last_n and last_n.group(2) == "hour":
+        hour = now.astype("datetime64[h]")
+        start, end, resolution = hour - (int(last_n.group(1)) - 1) * HOUR, hour + HOUR, "hour"
+    elif last_n:
+        start, end, resolution = today - (int(last_n.group(1)) - 1) * DAY, today + DAY, "day"
+    elif date_range:
+        start = np.datetime64(date_range.group(1), "D")
+        end = np.datetime64(date_range.group(2) or date_range.group(1), "D") + DAY
+        resolution = "hour" if end - start == DAY else "day"
+    else:
+        return None, None, "day"
+    return start.astype("datetime64[s]"), end.astype("datetime64[s]"), resolution
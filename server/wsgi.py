@@ -0,0 +1,17 @@
+# WSGI entry point for production servers, e.g.:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# Importing app loads the KPI store, forecast index and RCA rules, so with
+# preload_app the work happens once in the master before workers fork.
+# The anomaly, offender and hierarchy indexes are left deferred: replaying
+# the history in the master would delay every start, so each worker builds
+# them in the background after it boots (see gunicorn.conf.py).
+
+import os
+
+from app import app
+
+# Ingest and SSE keep state per process; gunicorn.conf.py refuses to start
+# with REALTIME_INGEST=1 unless there is exactly one, never-recycled worker.
+app.config['REALTIME_INGEST'] = os.environ.get('REALTIME_INGEST') == '1'
+
+__all__ = ['app']
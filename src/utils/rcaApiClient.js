@@ -1,10 +1,23 @@
 // API client for RCA and Next Best Action services
 
 const API_BASE_URL = 'http://localhost:5000';
+// Sites whose last next-best-action response is kept for revalidation
+const NEXT_BEST_ACTION_CACHE_SIZE = 200;
 
 class RCAApiClient {
   constructor() {
     this.baseUrl = API_BASE_URL;
+    // Last next-best-action response per site, revalidated with its ETag.
+    // Map keeps insertion order, so the first key is the least recently used.
+    this.nextBestActionCache = new Map();
+  }
+
+  rememberNextBestAction(siteId, entry) {
+    this.nextBestActionCache.delete(siteId);
+    this.nextBestActionCache.set(siteId, entry);
+    if (this.nextBestActionCache.size > NEXT_BEST_ACTION_CACHE_SIZE) {
+      this.nextBestActionCache.delete(this.nextBestActionCache.keys().next().value);
+    }
   }
 
   async performRCA(siteData) {
@@ -29,21 +42,77 @@ class RCAApiClient {
     }
   }
 
+  async performBatchRCA(sites) {
+    try {
+      const response = await fetch(`${this.baseUrl}/rca/analyze-batch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ sites })
+      });
+
+      if (!response.ok) {
+        throw new Error(`Batch RCA API error: ${response.statusText}`);
+      }
+
+      const { results } = await response.json();
+      return results;
+    } catch (error) {
+      console.warn('Batch RCA API unavailable, using local analysis:', error);
+      return sites.map((site) => this.localRCAFallback(site));
+    }
+  }
+
+  // One combined analysis over every sector's KPIs (sectorInfo[].kpis)
+  async performSiteRCA(siteData) {
+    try {
+      const response = await fetch(`${this.baseUrl}/rca/analyze-site`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ site: siteData })
+      });
+
+      if (!response.ok) {
+        throw new Error(`Site RCA API error: ${response.statusText}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.warn('Site RCA API unavailable, using local analysis:', error);
+      return this.localRCAFallback(siteData);
+    }
+  }
+
   async getNextBestAction(siteData, context = {}) {
+    const cached = this.nextBestActionCache.get(siteData.id);
     try {
       const response = await fetch(`${this.baseUrl}/recommendations/next-best-action`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(cached ? { 'If-None-Match': cached.etag } : {}),
         },
         body: JSON.stringify({ site: siteData, context })
       });
 
+      if (response.status === 304 && cached) {
+        this.rememberNextBestAction(siteData.id, cached);
+        return cached.body;
+      }
+
       if (!response.ok) {
         throw new Error(`Next Best Action API error: ${response.statusText}`);
       }
 
-      return await response.json();
+      const body = await response.json();
+      const etag = response.headers.get('ETag');
+      if (etag) {
+        this.rememberNextBestAction(siteData.id, { etag, body });
+      }
+      return body;
     } catch (error) {
       console.warn('Next Best Action API unavailable, using local analysis:', error);
       return this.localNextBestActionFallback(siteData);
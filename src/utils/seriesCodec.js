@@ -0,0 +1,39 @@
+// Decoder for the server's packed series format (Accept: application/vnd.awsp.series).
+// Arrays are typed-array views on the response buffer; nothing is copied.
+
+export const SERIES_MIMETYPE = 'application/vnd.awsp.series';
+
+export function decodeSeries(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== 'AWSS') {
+    throw new Error('Not a packed series response');
+  }
+  const headerLength = view.getUint32(8, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+  let offset = 12 + headerLength;
+  header.series = header.series.map((series) => {
+    const deltas = new Int32Array(buffer, offset, series.count);
+    offset += 4 * series.count;
+    const values = new Float32Array(buffer, offset, series.count);
+    offset += 4 * series.count;
+    // Dates are start + delta * unit, in epoch seconds.
+    const timestamp = (i) => series.start + deltas[i] * series.unit;
+    return { ...series, deltas, values, timestamp };
+  });
+  return header;
+}
+
+export async function fetchSeries(url, options = {}) {
+  const response = await fetch(url, {
+    ...options,
+    headers: { ...(options.headers || {}), Accept: SERIES_MIMETYPE },
+  });
+  if (!response.ok) {
+    throw new Error(`Series request failed: ${response.statusText}`);
+  }
+  if (response.headers.get('Content-Type') !== SERIES_MIMETYPE) {
+    return response.json();
+  }
+  return decodeSeries(await response.arrayBuffer());
+}